@@ -0,0 +1,233 @@
+"""
+Functions for scraping the tweets of many users at once.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from twitscrape import PAGE_SIZE, update_all_tweets
+
+
+class TokenBucket:
+    """
+    A thread safe token bucket which limits how often requests are made.
+
+    Attributes:
+        _rate: number of tokens added to the bucket per second.
+        _capacity: most tokens the bucket can hold, which is the largest burst
+        of requests allowed at once.
+        _tokens: number of tokens currently in the bucket.
+        _updated: clock value of the last refill.
+        _lock: lock guarding the bucket between threads.
+        _sleep: function used to wait for tokens, replaceable in tests.
+        _clock: function giving the current time in seconds, replaceable in
+        tests.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self, rate, capacity=1, sleep=time.sleep, clock=time.monotonic
+    ):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self._sleep = sleep
+
+    def acquire(self, tokens=1):
+        """
+        Takes tokens from the bucket, waiting until there are enough.
+
+        Args:
+            tokens (int): number of tokens to take.
+
+        Returns:
+            waited (float): number of seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self._rate
+            self._sleep(wait)
+            waited += wait
+
+    def release(self, tokens=1):
+        """
+        Gives back tokens that were taken but not used.
+
+        Args:
+            tokens (int): number of tokens to give back.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._capacity, self._tokens + tokens)
+
+    def _refill(self):
+        """
+        Adds the tokens earned since the last refill. The lock must be held.
+        """
+        now = self._clock()
+        self._tokens = min(
+            self._capacity, self._tokens + (now - self._updated) * self._rate
+        )
+        self._updated = now
+
+
+class ScrapeProgress:
+    """
+    Thread safe progress and throughput counters for a batch of scrapes.
+
+    Attributes:
+        _handles: dictionary of the counters of each handle, keyed by handle.
+        Each holds the status (pending, running, retrying, done or failed),
+        number of tweets read, attempts made, start and end times, and the
+        last error.
+        _lock: lock guarding the counters between threads.
+    """
+
+    def __init__(self, handles):
+        self._handles = {
+            handle: {
+                "status": "pending",
+                "tweets": 0,
+                "attempts": 0,
+                "started": None,
+                "finished": None,
+                "error": None,
+            }
+            for handle in handles
+        }
+        self._lock = threading.Lock()
+
+    def update(self, handle, **values):
+        """
+        Sets counters of a handle.
+
+        Args:
+            handle (str): handle whose counters to set.
+            values: counter names and their new values.
+        """
+        with self._lock:
+            self._handles[handle].update(values)
+
+    def add_tweets(self, handle, count=1):
+        """
+        Adds to the number of tweets read for a handle.
+
+        Args:
+            handle (str): handle whose count to add to.
+            count (int): number of tweets read.
+        """
+        with self._lock:
+            self._handles[handle]["tweets"] += count
+
+    def get_progress(self):
+        """
+        Gets a snapshot of every handle's counters.
+
+        Returns:
+            progress (dict): copy of each handle's counters keyed by handle,
+            with the elapsed seconds and tweets read per second added.
+        """
+        now = time.monotonic()
+        with self._lock:
+            progress = {
+                handle: dict(counters)
+                for handle, counters in self._handles.items()
+            }
+        for counters in progress.values():
+            if counters["started"] is None:
+                counters["elapsed"] = 0.0
+            else:
+                counters["elapsed"] = (counters["finished"] or now) - counters[
+                    "started"
+                ]
+            counters["tweets_per_second"] = (
+                counters["tweets"] / counters["elapsed"]
+                if counters["elapsed"] > 0
+                else 0.0
+            )
+        return progress
+
+
+# pylint: disable=too-many-arguments
+def scrape_handles(
+    handles,
+    max_workers=4,
+    rate=1.0,
+    burst=5,
+    page_size=PAGE_SIZE,
+    retries=3,
+    backoff=1.0,
+    progress=None,
+    sleep=time.sleep,
+):
+    """
+    Updates the all-tweets csvs of many users in parallel.
+
+    Each handle is scraped with update_all_tweets on a pool of threads, so it
+    streams into its own archive and only new tweets are fetched. Every page
+    of tweets takes a token from a bucket shared by all the threads before it
+    is requested, and failed scrapes are retried with exponential backoff.
+    Retries resume from the partial csv left by the failed attempt.
+
+    Args:
+        handles (list): handles of the accounts to scrape.
+        max_workers (int): number of handles scraped at once.
+        rate (float): pages of tweets that may be requested per second.
+        burst (int): pages that may be requested at once before rate applies.
+        page_size (int): number of tweets the scraper gets per request.
+        retries (int): number of times to retry a handle after it fails.
+        backoff (float): seconds to wait before the first retry. The wait
+        doubles with every retry.
+        progress (ScrapeProgress): counters to update, so another thread can
+        watch them. A new one is made if not given.
+        sleep (function): used to wait for tokens and between retries,
+        replaceable in tests.
+
+    Returns:
+        progress (ScrapeProgress): the final counters of every handle.
+    """
+    if progress is None:
+        progress = ScrapeProgress(handles)
+    bucket = TokenBucket(rate, burst, sleep=sleep)
+
+    def scrape(handle):
+        def on_tweet(_):
+            progress.add_tweets(handle)
+
+        progress.update(handle, status="running", started=time.monotonic())
+        for attempt in range(retries + 1):
+            progress.update(handle, attempts=attempt + 1)
+            try:
+                update_all_tweets(
+                    handle,
+                    on_tweet=on_tweet,
+                    bucket=bucket,
+                    page_size=page_size,
+                )
+            except Exception as error:  # pylint: disable=broad-except
+                progress.update(handle, error=repr(error))
+                if attempt == retries:
+                    progress.update(
+                        handle, status="failed", finished=time.monotonic()
+                    )
+                    return
+                progress.update(handle, status="retrying")
+                sleep(backoff * 2**attempt)
+            else:
+                progress.update(
+                    handle, status="done", finished=time.monotonic()
+                )
+                return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(scrape, handles))
+    return progress
@@ -0,0 +1,427 @@
+"""
+Benchmarks of the tweet processing and stock functions on made up data.
+
+Everything runs offline in a temporary folder: tweet archives are generated
+in the raw-data csv schema, prices come from a generated random walk instead
+of Yahoo Finance, and the scraper reads generated tweets instead of
+snscrape. Results are saved as JSON so runs from different versions can be
+compared.
+
+Run it with:
+
+    python benchmark.py --sizes 10000 1000000 --tickers 4
+"""
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+# generated tweets cover the same span of time as the made up prices
+from fake_prices import END_DATE, START_DATE, price_fetch
+
+# rows of the generated archives in the full suite
+SIZES = [10_000, 1_000_000, 10_000_000]
+
+# folder the results are saved in, one file per version
+RESULTS_DIR = "benchmark-results"
+
+# the number of tweets the stand-in scraper yields
+_SCRAPE_ROWS = 10_000
+
+_WORDS = np.array(
+    "tesla model rocket launch great funding secured stock price car "
+    "battery solar mars ship production factory the a is of to and "
+    "amazing bad news soon coming next week year".split(),
+    dtype=object,
+)
+
+
+def tweet_archive(rows, seed=0, start=START_DATE, end=END_DATE):
+    """
+    Generates a made up tweet archive the way the scraper writes them.
+
+    Args:
+        rows (int): the number of tweets.
+        seed (int): the seed of the random generator, so the same arguments
+        always give the same archive.
+        start (str): the earliest time a tweet can have, YYYY-MM-DD.
+        end (str): the time every tweet is before, YYYY-MM-DD.
+
+    Returns:
+        archive (pd.dataframe): dataframe with the date and time, content,
+        like count and retweet count columns of raw-data csvs, newest first.
+    """
+    rng = np.random.default_rng(seed)
+    seconds = rng.integers(
+        np.datetime64(start, "s").astype(np.int64),
+        np.datetime64(end, "s").astype(np.int64),
+        rows,
+    )
+    seconds = np.sort(seconds)[::-1].astype("datetime64[s]")
+    dates = pd.Series(np.datetime_as_string(seconds))
+    dates = dates.str.replace("T", " ", regex=False) + "+00:00"
+
+    words = _WORDS[rng.integers(0, len(_WORDS), (rows, 8))]
+    lengths = rng.integers(1, 9, rows)
+    content = pd.Series(words[:, 0])
+    for column in range(1, 8):
+        content = content.where(
+            lengths <= column, content + " " + words[:, column]
+        )
+    # about a third of tweets are replies, like the real archives
+    content = content.where(rng.random(rows) > 0.3, "@someone " + content)
+
+    return pd.DataFrame(
+        {
+            "date and time": dates,
+            "content": content,
+            "like count": rng.zipf(1.5, rows) % 1_000_000,
+            "retweet count": rng.zipf(1.8, rows) % 100_000,
+        }
+    )
+
+
+def write_tweet_archive(name, rows, seed=0, chunksize=1_000_000):
+    """
+    Writes a made up archive to raw-data/{name}-all-tweets.csv.
+
+    Archives are generated and written a chunk at a time, so 10 million
+    rows don't have to fit in memory at once.
+
+    Args:
+        name (str): the name of the user the archive is for.
+        rows (int): the number of tweets.
+        seed (int): the seed of the random generator.
+        chunksize (int): the number of tweets generated at a time.
+    """
+    os.makedirs("raw-data", exist_ok=True)
+    chunks = max(1, -(-rows // chunksize))
+    # each chunk covers its own slice of time so the file stays sorted
+    bounds = pd.date_range(END_DATE, START_DATE, periods=chunks + 1)
+    with open(
+        f"raw-data/{name}-all-tweets.csv", "w", encoding="utf-8", newline=""
+    ) as file:
+        for chunk in range(chunks):
+            archive = tweet_archive(
+                min(chunksize, rows - chunk * chunksize),
+                seed + chunk,
+                str(bounds[chunk + 1]),
+                str(bounds[chunk]),
+            )
+            archive.to_csv(file, header=chunk == 0, index=False)
+
+
+def _offline_download(*args, **kwargs):
+    """
+    Replaces yfinance.download so any network use fails loudly.
+    """
+    raise RuntimeError("benchmarks must not download prices")
+
+
+@contextmanager
+def offline():
+    """
+    Runs in a temporary folder with Yahoo Finance and snscrape stubbed out.
+
+    Yields:
+        folder (str): the temporary folder.
+    """
+    # pylint: disable=import-outside-toplevel
+    import yfinance
+    import price_store
+    import twitscrape
+
+    saved = (
+        os.getcwd(),
+        price_store._DEFAULT_STORE,
+        yfinance.download,
+        twitscrape._user_items,
+        twitscrape._search_items,
+    )
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        price_store._DEFAULT_STORE = price_store.PriceStore(
+            "prices.sqlite", price_fetch
+        )
+        yfinance.download = _offline_download
+        twitscrape._user_items = _scraped_tweets
+        twitscrape._search_items = lambda query: iter(())
+        try:
+            yield folder
+        finally:
+            os.chdir(saved[0])
+            price_store._DEFAULT_STORE = saved[1]
+            yfinance.download = saved[2]
+            twitscrape._user_items = saved[3]
+            twitscrape._search_items = saved[4]
+
+
+def _scraped_tweets(handle):
+    """
+    Stands in for snscrape, yielding the tweets of a generated archive.
+
+    Args:
+        handle (str): the name of the user, which sets the random seed.
+
+    Yields:
+        tweet: an object with the attributes the scraper reads.
+    """
+    archive = tweet_archive(_SCRAPE_ROWS, seed=len(handle))
+    dates = pd.to_datetime(archive["date and time"], utc=True)
+    for date, row in zip(dates, archive.itertuples(index=False)):
+        yield SimpleNamespace(
+            date=date.to_pydatetime(),
+            rawContent=row.content,
+            likeCount=int(row[2]),
+            retweetCount=int(row[3]),
+        )
+
+
+def time_call(function, repeat=5, setup=None):
+    """
+    Times a function call several times.
+
+    Args:
+        function (function): the function to time, called without
+        arguments, or with the result of setup.
+        repeat (int): the number of times to call it.
+        setup (function): a function run untimed before each call, whose
+        result is passed to function, or None.
+
+    Returns:
+        timing (dict): the first, fastest and median times in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        start = time.perf_counter()
+        if setup is not None:
+            function(argument)
+        else:
+            function()
+        times.append(time.perf_counter() - start)
+    return {
+        "first": times[0],
+        "min": min(times),
+        "median": statistics.median(times),
+        "repeat": repeat,
+    }
+
+
+# pylint: disable=too-many-locals
+def run_benchmarks(sizes=(10_000,), tickers=3, repeat=5):
+    """
+    Runs every benchmark on made up data, offline.
+
+    Args:
+        sizes (list): the numbers of tweets in each generated archive.
+        tickers (int): the number of generated tickers for the screening
+        benchmark.
+        repeat (int): the number of times each benchmark is run.
+
+    Returns:
+        results (list): a dictionary for each benchmark with its name,
+        parameters and timing.
+    """
+    # pylint: disable=import-outside-toplevel
+    import csv_process
+    import stock_plot
+    import twitscrape
+
+    results = []
+
+    def record(name, timing, **params):
+        results.append(dict(name=name, params=params, **timing))
+
+    with offline():
+        for rows in sizes:
+            name = f"bench{rows}"
+            write_tweet_archive(name, rows)
+            tweets = csv_process.read_to_variable(name)
+            middle = tweets[len(tweets) // 2][0]
+            show_date = datetime.strptime(middle[:10], "%Y-%m-%d")
+            # queries are timed on a store, as lists are rebuilt every call
+            store = csv_process.load_tweet_store(name)
+
+            record(
+                "read_to_variable",
+                time_call(lambda: csv_process.read_to_variable(name), repeat),
+                rows=rows,
+            )
+            record(
+                "load_tweet_store",
+                time_call(
+                    lambda _: csv_process.load_tweet_store(name),
+                    repeat,
+                    # clear the in-memory copy so the disk cache is read
+                    setup=csv_process._TWEET_STORES.clear,
+                ),
+                rows=rows,
+            )
+            record(
+                "show_tweets_on",
+                time_call(
+                    lambda: csv_process.show_tweets_on(
+                        store, show_date.strftime("%m-%d-%Y")
+                    ),
+                    repeat,
+                ),
+                rows=rows,
+            )
+            record(
+                "get_tweets_around",
+                time_call(
+                    lambda: csv_process.get_tweets_around(
+                        store, middle[:10], 15
+                    ),
+                    repeat,
+                ),
+                rows=rows,
+            )
+            del tweets, store
+
+        handle = "benchscraper"
+        record(
+            "update_all_tweets",
+            time_call(
+                lambda _: twitscrape.update_all_tweets(handle),
+                repeat,
+                setup=lambda: _remove(f"raw-data/{handle}-all-tweets.csv"),
+            ),
+            rows=_SCRAPE_ROWS,
+        )
+
+        def fresh_stock():
+            return stock_plot.StockPlot("T0", START_DATE, END_DATE)
+
+        days = len(fresh_stock().get_stock_data())
+        for method, call in (
+            ("get_variance_data", lambda stock: stock.get_variance_data()),
+            ("get_normalized_data", lambda stock: stock.get_normalized_data()),
+            (
+                "get_range_date",
+                lambda stock: stock.get_range_date("2018-08-07", 9),
+            ),
+        ):
+            record(
+                f"StockPlot.{method}",
+                time_call(call, repeat, setup=fresh_stock),
+                days=days,
+            )
+
+        names = [f"T{i}" for i in range(tickers)]
+        universe = stock_plot.StockUniverse(names, START_DATE, END_DATE)
+        variance = universe.get_variance_data()
+        record(
+            "screen_abnormal_drops",
+            time_call(
+                lambda: stock_plot.screen_abnormal_drops(
+                    variance, names[0], names[1:]
+                ),
+                repeat,
+            ),
+            days=days,
+            tickers=tickers,
+        )
+    return results
+
+
+def _remove(path):
+    """
+    Removes a file if it exists.
+
+    Args:
+        path (str): path of the file.
+
+    Returns:
+        path (str): the path.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    return path
+
+
+def _version():
+    """
+    Gets the git version of the code being benchmarked.
+
+    Returns:
+        version (str): the output of git describe, or "unknown".
+    """
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            check=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(results, path=None):
+    """
+    Saves benchmark results as JSON along with the version and machine.
+
+    Args:
+        results (list): the results of run_benchmarks.
+        path (str): the file to save to, or None for
+        benchmark-results/{version}.json.
+
+    Returns:
+        path (str): the file the results were saved to.
+    """
+    version = _version()
+    if path is None:
+        path = os.path.join(RESULTS_DIR, f"{version}.json")
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    report = {
+        "version": version,
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=1)
+    return path
+
+
+def main():
+    """
+    Runs the benchmarks from the command line.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES[:1])
+    parser.add_argument("--tickers", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.tickers, args.repeat)
+    path = save_results(results, args.output)
+    for result in results:
+        params = ", ".join(f"{k}={v}" for k, v in result["params"].items())
+        print(
+            f"{result['name']:<30} {params:<24}"
+            f" min {result['min'] * 1000:10.2f} ms"
+            f"  median {result['median'] * 1000:10.2f} ms"
+        )
+    print(f"saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
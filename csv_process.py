@@ -1,9 +1,519 @@
 """
 Functions for manipulating scraped tweets.
 """
-from datetime import timedelta, datetime
+from contextlib import contextmanager
+from datetime import timedelta, datetime, timezone
 import csv
-import pandas as pd
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import instrument
+
+# pandas is slow to import, so the functions that need it import it
+# themselves rather than every script paying for it on import
+
+# timestamp format used by the scraper when writing raw csvs
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S%z"
+
+# folder holding the parsed, binary copies of the raw csvs
+CACHE_DIR = "cache"
+
+# bump whenever the layout of the cached tweet stores changes
+_CACHE_VERSION = 1
+
+# tweet stores that have already been built, keyed by twitter handle
+_TWEET_STORES = {}
+
+
+class TweetStore:
+    """
+    A columnar, time-sorted store of the tweets in a scraped csv.
+
+    Timestamps are parsed a single time into a sorted datetime64 array so
+    that date queries can be answered with a binary search instead of
+    reparsing every row.
+
+    Attributes:
+        _header: a list of the column names of the csv.
+        _rows: a sequence of the raw csv rows (lists of strings), in the
+        order they were written to the csv.
+        _timestamps: a sorted numpy datetime64 array of the tweet times in
+        UTC.
+        _order: a numpy int64 array mapping each sorted position to its
+        position in _rows.
+        _likes: a numpy int64 array of like counts, in sorted order.
+        _retweets: a numpy int64 array of retweet counts, in sorted order.
+        _is_reply: a numpy bool array which is True for replies, in sorted
+        order.
+
+    Note:
+        Missing like or retweet counts are stored as 0.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self, header, rows, timestamps, order, likes, retweets, is_reply
+    ):
+        self._header = list(header)
+        self._rows = rows
+        self._timestamps = timestamps
+        self._order = order
+        self._likes = likes
+        self._retweets = retweets
+        self._is_reply = is_reply
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Builds a tweet store from a list of csv rows.
+
+        Args:
+            rows (list): list of tweets as returned by read_to_variable, with
+            the header as the first row.
+
+        Returns:
+            store (TweetStore): a store containing every tweet in rows.
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+
+        header = rows[0] if rows else ["date and time", "content"]
+        body = rows[1:]
+        columns = list(zip(*body)) if body else [()] * len(header)
+
+        with instrument.span("csv_process.parse_timestamps", rows=len(body)):
+            timestamps = pd.to_datetime(
+                pd.Series(columns[0], dtype=object),
+                format=DATE_FORMAT,
+                utc=True,
+            )
+        timestamps = (
+            timestamps.dt.tz_localize(None).to_numpy().astype("datetime64[ns]")
+        )
+        contents = pd.Series(columns[1], dtype=object).astype(str)
+        is_reply = contents.str.startswith("@").to_numpy(dtype=bool)
+
+        counts = []
+        for name in ("like count", "retweet count"):
+            if name in header:
+                values = pd.Series(columns[header.index(name)], dtype=object)
+                values = pd.to_numeric(values, errors="coerce").fillna(0)
+                counts.append(values.to_numpy(dtype=np.int64))
+            else:
+                counts.append(np.zeros(len(body), dtype=np.int64))
+
+        order = np.argsort(timestamps, kind="stable").astype(np.int64)
+        return cls(
+            header,
+            body,
+            timestamps[order],
+            order,
+            counts[0][order],
+            counts[1][order],
+            is_reply[order],
+        )
+
+    @classmethod
+    def load(cls, folder):
+        """
+        Loads a tweet store saved with save, memory-mapping its columns.
+
+        Args:
+            folder (str): path of the folder the store was saved to.
+
+        Returns:
+            store (TweetStore): the saved store.
+        """
+        header = read_cache_meta(folder)["header"]
+
+        def column(name):
+            return np.load(os.path.join(folder, f"{name}.npy"), mmap_mode="r")
+
+        rows = _PackedRows(
+            [column(f"text-{i}") for i in range(len(header))],
+            [column(f"offsets-{i}") for i in range(len(header))],
+        )
+        return cls(
+            header,
+            rows,
+            column("timestamps").view("datetime64[ns]"),
+            column("order"),
+            column("likes"),
+            column("retweets"),
+            column("is_reply"),
+        )
+
+    def save(self, folder, meta=None):
+        """
+        Saves the store as a folder of numpy arrays that load can map.
+
+        The text of every row is stored as one utf-8 blob per column with an
+        array of offsets, so rows can be decoded one at a time.
+
+        Args:
+            folder (str): path of the folder to save the store to.
+            meta (dict): extra values to record in the folder's meta.json.
+        """
+        with replace_folder(folder) as temp:
+
+            def column(name, values):
+                np.save(os.path.join(temp, f"{name}.npy"), values)
+
+            for i in range(len(self._header)):
+                encoded = [row[i].encode("utf-8") for row in self._rows]
+                offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+                np.cumsum([len(text) for text in encoded], out=offsets[1:])
+                column(f"text-{i}", np.frombuffer(b"".join(encoded), np.uint8))
+                column(f"offsets-{i}", offsets)
+            column("timestamps", self._timestamps.view(np.int64))
+            column("order", self._order)
+            column("likes", self._likes)
+            column("retweets", self._retweets)
+            column("is_reply", self._is_reply)
+
+            meta = dict(meta or {}, header=self._header, version=_CACHE_VERSION)
+            with open(
+                os.path.join(temp, "meta.json"), "w", encoding="utf-8"
+            ) as file:
+                json.dump(meta, file)
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    # Getter Methods
+    def get_header(self):
+        """A getter method for the csv column names."""
+        return self._header
+
+    def get_timestamps(self):
+        """A getter method for the sorted tweet timestamps (UTC)."""
+        return self._timestamps
+
+    def get_likes(self):
+        """A getter method for the like counts, in timestamp order."""
+        return self._likes
+
+    def get_retweets(self):
+        """A getter method for the retweet counts, in timestamp order."""
+        return self._retweets
+
+    def get_reply_mask(self):
+        """A getter method for the is-reply mask, in timestamp order."""
+        return self._is_reply
+
+    def get_rows(self):
+        """A getter method for the raw csv rows, in csv order."""
+        return self._rows
+
+    def get_row(self, position):
+        """
+        Gets the raw csv row of the tweet at a sorted position.
+
+        Args:
+            position (int): index into the timestamp-sorted columns.
+
+        Returns:
+            row (list): the tweet's row as it appears in the csv.
+        """
+        return self._rows[self._order[position]]
+
+    def window_bounds(self, start, end):
+        """
+        Finds the sorted positions of tweets strictly between two times.
+
+        Args:
+            start (datetime): exclusive lower bound, in UTC.
+            end (datetime): exclusive upper bound, in UTC.
+
+        Returns:
+            bounds (tuple): the first and one past the last position of the
+            tweets in the window.
+        """
+        low = np.searchsorted(
+            self._timestamps, np.datetime64(start, "ns"), side="right"
+        )
+        high = np.searchsorted(
+            self._timestamps, np.datetime64(end, "ns"), side="left"
+        )
+        return int(low), int(max(low, high))
+
+    def rows_between(self, low, high, replies=False):
+        """
+        Gets the rows of the tweets between two sorted positions.
+
+        Args:
+            low (int): first sorted position to include.
+            high (int): one past the last sorted position to include.
+            replies (bool): whether to include replies.
+
+        Returns:
+            rows (list): the csv rows of the tweets in csv order.
+        """
+        positions = np.arange(low, high)
+        if not replies:
+            positions = positions[~self._is_reply[low:high]]
+        return [self._rows[i] for i in np.sort(self._order[positions])]
+
+    def tweets_on(self, date):
+        """
+        Gets the non-reply tweets from a specific day.
+
+        Args:
+            date (str): date of tweets to look for in the format mm-dd-yyyy.
+
+        Returns:
+            specific_tweets (list): list of all tweets on specified date.
+        """
+        day = datetime.strptime(date, "%m-%d-%Y")
+        low, high = self.window_bounds(
+            day - timedelta(microseconds=1), day + timedelta(days=1)
+        )
+        return self.rows_between(low, high)
+
+    def tweets_around(self, mid_date, search_range=15):
+        """
+        Gets the non-reply tweets within a number of days of a date.
+
+        Args:
+            mid_date (str): midpoint date in the format yyyy-mm-dd.
+            search_range (int): number of days before and after to include.
+
+        Returns:
+            specific_tweets (list): list of all tweets strictly within the
+            range.
+        """
+        mid_date = datetime.strptime(mid_date, "%Y-%m-%d")
+        time_delta = timedelta(days=search_range)
+        low, high = self.window_bounds(
+            mid_date - time_delta, mid_date + time_delta
+        )
+        return self.rows_between(low, high)
+
+    def windows_bounds(self, mid_dates, search_range=15):
+        """
+        Finds the sorted positions of the tweets around many dates at once.
+
+        Both ends of every window are found with a single binary search over
+        the timestamps.
+
+        Args:
+            mid_dates (list): midpoint dates in the format yyyy-mm-dd, or
+            anything numpy can convert to datetime64.
+            search_range (int): number of days before and after to include.
+
+        Returns:
+            bounds (tuple): numpy arrays of the first and one past the last
+            position of the tweets strictly within each window.
+        """
+        mid_dates = np.asarray(mid_dates, dtype="datetime64[ns]")
+        time_delta = np.timedelta64(search_range, "D")
+        # an exclusive lower bound is the first timestamp at least 1ns above it
+        edges = np.concatenate(
+            [
+                mid_dates - time_delta + np.timedelta64(1, "ns"),
+                mid_dates + time_delta,
+            ]
+        )
+        found = np.searchsorted(self._timestamps, edges, side="left")
+        lows, highs = found[: len(mid_dates)], found[len(mid_dates) :]
+        return lows, np.maximum(lows, highs)
+
+    def tweets_around_frame(self, mid_dates, search_range=15, replies=False):
+        """
+        Gets the tweets around many dates as one long-format dataframe.
+
+        Args:
+            mid_dates (list): midpoint dates in the format yyyy-mm-dd.
+            search_range (int): number of days before and after to include.
+            replies (bool): whether to include replies.
+
+        Returns:
+            tweets_df (pd.dataframe): one row per tweet and window, with the
+            window's event_id and event_date, the tweet's sorted position,
+            and the csv columns with typed dates and counts. Tweets are in
+            timestamp order within each window.
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+
+        event_dates = np.asarray(mid_dates, dtype="datetime64[ns]")
+        lows, highs = self.windows_bounds(event_dates, search_range)
+        lengths = highs - lows
+        event_ids = np.repeat(np.arange(len(lows)), lengths)
+        # position of every match: each window's low plus a running offset
+        starts = np.cumsum(lengths) - lengths
+        positions = np.arange(lengths.sum()) + np.repeat(lows - starts, lengths)
+        if not replies:
+            keep = ~self._is_reply[positions]
+            event_ids, positions = event_ids[keep], positions[keep]
+
+        tweets_df = pd.DataFrame(
+            [self._rows[i] for i in self._order[positions]],
+            columns=self._header,
+        )
+        tweets_df[self._header[0]] = self._timestamps[positions]
+        for name, values in (
+            ("like count", self._likes),
+            ("retweet count", self._retweets),
+        ):
+            if name in self._header:
+                tweets_df[name] = values[positions]
+        tweets_df.insert(0, "position", positions)
+        tweets_df.insert(0, "event_date", event_dates[event_ids])
+        tweets_df.insert(0, "event_id", event_ids)
+        return tweets_df
+
+
+class _PackedRows:
+    """
+    A read only sequence of csv rows decoded on access from utf-8 blobs.
+
+    Attributes:
+        _texts: a list with a uint8 array of encoded text for each column.
+        _offsets: a list with an int64 array of row offsets into each text.
+    """
+
+    def __init__(self, texts, offsets):
+        self._texts = texts
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets[0]) - 1
+
+    def __getitem__(self, index):
+        row = []
+        for text, offsets in zip(self._texts, self._offsets):
+            start, end = offsets[index], offsets[index + 1]
+            row.append(text[start:end].tobytes().decode("utf-8"))
+        return row
+
+
+def source_signature(path):
+    """
+    Gets the values used to tell if a raw csv changed since it was cached.
+
+    Args:
+        path (str): path of the raw csv.
+
+    Returns:
+        signature (dict): the modification time and size of the file.
+    """
+    stat = os.stat(path)
+    return {"source_mtime_ns": stat.st_mtime_ns, "source_size": stat.st_size}
+
+
+def read_cache_meta(folder):
+    """
+    Reads the meta.json of a folder in the cache.
+
+    Args:
+        folder (str): path of the cached data, such as a tweet store.
+
+    Returns:
+        meta (dict): the cached data's meta, or None if there isn't one.
+    """
+    meta_path = os.path.join(folder, "meta.json")
+    try:
+        with open(meta_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def replace_folder(folder):
+    """
+    Writes a new copy of a cache folder beside it and swaps it into place.
+
+    The old folder is moved aside and removed rather than overwritten, so
+    stores that still memory-map its files keep reading their old data.
+
+    Args:
+        folder (str): path of the cache folder to replace.
+
+    Yields:
+        temp (str): path of the empty folder to write the new copy to. It
+        replaces folder once the block finishes, and is removed instead if
+        the block raises.
+    """
+    parent = os.path.dirname(folder) or "."
+    os.makedirs(parent, exist_ok=True)
+    name = os.path.basename(folder)
+    temp = tempfile.mkdtemp(prefix=f"{name}.new-", dir=parent)
+    try:
+        yield temp
+    except BaseException:
+        shutil.rmtree(temp, ignore_errors=True)
+        raise
+    old = None
+    if os.path.exists(folder):
+        old = tempfile.mkdtemp(prefix=f"{name}.old-", dir=parent)
+        old = os.path.join(old, name)
+        os.replace(folder, old)
+    os.replace(temp, folder)
+    if old is not None:
+        shutil.rmtree(os.path.dirname(old), ignore_errors=True)
+
+
+def load_tweet_store(name, use_cache=True):
+    """
+    Loads the tweet store for a user, building it on first use.
+
+    The first load parses the user's raw csv and saves a binary copy in the
+    cache folder. Later loads memory-map that copy instead, until the raw
+    csv's modification time or size changes.
+
+    Args:
+        name (str): the name of the user's data to load.
+        use_cache (bool): whether to read and write the on-disk cache.
+
+    Returns:
+        store (TweetStore): store of every tweet in the user's csv.
+    """
+    path = f"raw-data/{name}-all-tweets.csv"
+    signature = source_signature(path)
+    cached = _TWEET_STORES.get(name)
+    if cached is not None and cached[0] == signature:
+        instrument.count("tweet_cache_hits")
+        return cached[1]
+
+    folder = os.path.join(CACHE_DIR, "tweets", f"{name}-all-tweets")
+    meta = read_cache_meta(folder) if use_cache else None
+    if (
+        meta is not None
+        and meta.get("version") == _CACHE_VERSION
+        and all(meta.get(key) == value for key, value in signature.items())
+    ):
+        instrument.count("tweet_cache_hits")
+        store = TweetStore.load(folder)
+    else:
+        instrument.count("tweet_cache_misses")
+        store = TweetStore.from_rows(read_to_variable(name))
+        if use_cache:
+            with instrument.span("csv_process.TweetStore.save", user=name):
+                store.save(folder, signature)
+
+    _TWEET_STORES[name] = (signature, store)
+    return store
+
+
+def as_store(tweets):
+    """
+    Gets a tweet store for a list of tweets.
+
+    A list is built into a new store on every call, as it may have changed
+    since the last one. To query the same tweets many times, pass a
+    TweetStore, such as the one load_tweet_store returns.
+
+    Args:
+        tweets (list or TweetStore): tweets as returned by read_to_variable.
+
+    Returns:
+        store (TweetStore): store of the given tweets.
+    """
+    if isinstance(tweets, TweetStore):
+        return tweets
+    return TweetStore.from_rows(tweets)
 
 
 def read_to_variable(name):
@@ -18,7 +528,9 @@ def read_to_variable(name):
         rows (list): list of all tweets with data in the given csv.
     """
     # read the raw data in based on name and year
-    with open(f"raw-data/{name}-all-tweets.csv", "r", encoding="utf-8") as file:
+    with instrument.span("csv_process.read_to_variable", user=name), open(
+        f"raw-data/{name}-all-tweets.csv", "r", encoding="utf-8"
+    ) as file:
         # sets reader object
         reader = csv.reader(file)
         # generates empty row list
@@ -26,16 +538,157 @@ def read_to_variable(name):
         # appends every row in the csv to new list
         for row in reader:
             rows.append(row)
+        instrument.count("rows_parsed", len(rows))
+        instrument.count("bytes_read", file.buffer.tell())
 
     return rows
 
 
+def _parse_utc(date_string):
+    """
+    Parses a raw csv timestamp into a naive datetime in UTC.
+
+    Args:
+        date_string (str): timestamp in the format yyyy-mm-dd HH:MM:SS+HH:MM.
+
+    Returns:
+        date (datetime): the timestamp in UTC without a timezone.
+    """
+    date = datetime.fromisoformat(date_string)
+    return date.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def iter_tweets(name, start=None, end=None, replies=False, newest_first=False):
+    """
+    Streams the tweets in a user's csv one row at a time.
+
+    Only a single row is held in memory at once, so this works for archives
+    too big to load with read_to_variable.
+
+    Args:
+        name (str): the name of the user's data to read.
+        start (datetime): exclusive lower bound on tweet time in UTC, or None.
+        end (datetime): exclusive upper bound on tweet time in UTC, or None.
+        replies (bool): whether to include replies.
+        newest_first (bool): whether the csv is sorted newest first, as the
+        scraper writes it. If so, reading stops once tweets are older than
+        start.
+
+    Yields:
+        row (list): each matching tweet's csv row, in csv order.
+
+    Note:
+        A single out of order row, such as a pinned tweet at the top of the
+        timeline, does not stop the read. Two in a row older than start do.
+    """
+    with open(f"raw-data/{name}-all-tweets.csv", "r", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        passed = 0
+        for row in reader:
+            tweet_date = _parse_utc(row[0])
+            if start is not None and tweet_date <= start:
+                passed += 1
+                if newest_first and passed > 1:
+                    return
+                continue
+            passed = 0
+            if end is not None and tweet_date >= end:
+                continue
+            if not replies and row[1].startswith("@"):
+                continue
+            yield row
+
+
+def iter_tweet_chunks(
+    name,
+    chunksize=100000,
+    start=None,
+    end=None,
+    replies=False,
+    newest_first=False,
+):
+    """
+    Streams the tweets in a user's csv as filtered pandas dataframes.
+
+    Args:
+        name (str): the name of the user's data to read.
+        chunksize (int): number of csv rows to read per chunk.
+        start (datetime): exclusive lower bound on tweet time in UTC, or None.
+        end (datetime): exclusive upper bound on tweet time in UTC, or None.
+        replies (bool): whether to include replies.
+        newest_first (bool): whether the csv is sorted newest first, as the
+        scraper writes it. If so, reading stops once a whole chunk is older
+        than start.
+
+    Yields:
+        tweets_df (pd.dataframe): the matching tweets of each chunk, with the
+        dates parsed to naive UTC datetimes. Empty chunks are skipped.
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    chunks = pd.read_csv(
+        f"raw-data/{name}-all-tweets.csv",
+        chunksize=chunksize,
+        dtype={"content": str},
+        keep_default_na=False,
+    )
+    for chunk in chunks:
+        dates = pd.to_datetime(
+            chunk["date and time"], format=DATE_FORMAT, utc=True
+        )
+        dates = dates.dt.tz_localize(None)
+        chunk["date and time"] = dates
+        keep = np.ones(len(chunk), dtype=bool)
+        if start is not None:
+            keep &= (dates > start).to_numpy()
+            if newest_first and not keep.any():
+                break
+        if end is not None:
+            keep &= (dates < end).to_numpy()
+        if not replies:
+            keep &= ~chunk["content"].str.startswith("@").to_numpy(dtype=bool)
+        if keep.any():
+            yield chunk[keep]
+
+
+def stream_tweets_around(name, mid_date, search_range=15, newest_first=True):
+    """
+    Finds the tweets around a date without loading the whole csv.
+
+    Args:
+        name (str): the name of the user's data to read.
+        mid_date (str): midpoint date to center search around.
+        search_range (int): number of days before and after to search through.
+        newest_first (bool): whether the csv is sorted newest first, as the
+        scraper writes it, so reading can stop once it passes the window.
+
+    Returns:
+        specific tweets (list): List of all tweets within specified days of
+        specified date, as get_tweets_around would return them.
+
+    Note:
+        Date must be in format yyyy-mm-dd.
+        This function omits replies.
+    """
+    mid_date = datetime.strptime(mid_date, "%Y-%m-%d")
+    time_delta = timedelta(days=search_range)
+    return list(
+        iter_tweets(
+            name,
+            mid_date - time_delta,
+            mid_date + time_delta,
+            newest_first=newest_first,
+        )
+    )
+
+
 def show_tweets_on(tweets, date):
     """
     Takes a list of tweets and returns tweets on a specific day.
 
     Args:
-        tweets (list): list of tweets to sweep through.
+        tweets (list or TweetStore): list of tweets to sweep through.
         date (str): date of tweets to look for.
 
     Returns:
@@ -44,21 +697,7 @@ def show_tweets_on(tweets, date):
     Note:
         Date must be in the format mm-dd-yyyy.
     """
-    specific_tweets = []
-    # loop through tweets in list
-    for tweet in tweets[1:]:
-        # gets content of tweet to allow for reply omission
-        content = tweet[1]
-        # pulls the string with the date values
-        temp_date = tweet[0]
-        # converts the string to a date time object
-        dt_obj = datetime.strptime(temp_date, "%Y-%m-%d %H:%M:%S%z")
-        # pulls the date and converts it to standard format
-        tweet_date = dt_obj.strftime("%m-%d-%Y")
-        # appends the tweet data if it matches the target date
-        if tweet_date == date and content[0] not in "@":
-            specific_tweets.append(tweet)
-    return specific_tweets
+    return as_store(tweets).tweets_on(date)
 
 
 def get_tweets_around(tweets_list, mid_date, search_range=15):
@@ -66,7 +705,7 @@ def get_tweets_around(tweets_list, mid_date, search_range=15):
     Finds all the tweets within a specific number of days of an initial date.
 
     Args:
-        tweets_list (list): list of tweets to search through.
+        tweets_list (list or TweetStore): list of tweets to search through.
         mid_date (str): midpoint date to center search around.
         range (int): number of days before and after to search through.
 
@@ -80,38 +719,130 @@ def get_tweets_around(tweets_list, mid_date, search_range=15):
         This function omits replies.
     """
 
-    # define empty tweets list
-    specific_tweets = []
+    return as_store(tweets_list).tweets_around(mid_date, search_range)
 
-    # convert input date to datetime object
-    mid_date = datetime.strptime(mid_date, "%Y-%m-%d")
 
-    # grab tweets based on name input:
+def get_tweets_around_dates(tweets_list, mid_dates, search_range=15):
+    """
+    Finds all the tweets within a number of days of each of many dates.
 
-    # create timedelta with input range
-    time_delta = timedelta(days=search_range)
+    Args:
+        tweets_list (list or TweetStore): list of tweets to search through.
+        mid_dates (list): midpoint dates to center each search around.
+        search_range (int): number of days before and after to search through.
+
+    Returns:
+        tweets_df (pd.dataframe): dataframe of the tweets around every date,
+        with an event_id column giving the index of the date in mid_dates.
+
+    Note:
+        Dates must be in format yyyy-mm-dd.
+        The default range is set to 15 days.
+        This function omits replies.
+    """
+    return as_store(tweets_list).tweets_around_frame(mid_dates, search_range)
 
-    # loop through tweets in list
-    for tweet in tweets_list[1:]:
-        # pulls the string with the date values
-        temp_date = tweet[0]
 
-        # pulls tweet content to allow reply omission.
-        content = tweet[1]
+def session_positions(timestamps, trading_days, exchange_tz, close="16:00"):
+    """
+    Finds the trading session each tweet could first move the stock in.
 
-        # converts the string to a date time object
-        tweet_date = datetime.strptime(temp_date, "%Y-%m-%d %H:%M:%S%z")
+    A tweet sent before a trading day's close belongs to that day. Tweets
+    sent after the close, on weekends or on holidays roll forward to the
+    next trading day.
 
-        # remove the timezone offset
-        tweet_date = tweet_date.replace(tzinfo=None)
+    Args:
+        timestamps (np.ndarray): datetime64 tweet times in UTC, sorted.
+        trading_days (pd.DatetimeIndex): sorted dates of the sessions.
+        exchange_tz (str): timezone of the exchange, such as
+        America/New_York.
+        close (str): local closing time of the exchange, HH:MM.
 
-        # appends the tweet data if within date range and not a reply.
-        if (mid_date - time_delta) < tweet_date < (
-            mid_date + time_delta
-        ) and content[0] not in "@":
-            specific_tweets.append(tweet)
+    Returns:
+        positions (np.ndarray): index of each tweet's session in
+        trading_days, or -1 for tweets after the last close or before the
+        close of the day before the first session.
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    days = pd.DatetimeIndex(trading_days).normalize()
+    if days.tz is not None:
+        days = days.tz_localize(None)
+    # every close in UTC, so the daylight saving shift is handled per day
+    closes = (days + pd.Timedelta(f"{close}:00")).tz_localize(exchange_tz)
+    closes = closes.tz_convert("UTC").tz_localize(None)
+    first_open = closes[:1] - pd.Timedelta(days=1)
+
+    stamps = np.asarray(timestamps, dtype="datetime64[ns]")
+    positions = np.searchsorted(closes.values, stamps, side="left")
+    outside = positions == len(closes)
+    if len(closes):
+        outside |= stamps <= first_open.values[0]
+    return np.where(outside, -1, positions)
+
+
+def daily_tweet_features(
+    tweets,
+    trading_days,
+    exchange_tz="America/New_York",
+    close="16:00",
+    scores=None,
+):
+    """
+    Adds up the tweets that land on each trading day.
 
-    return specific_tweets
+    Args:
+        tweets (list or TweetStore): tweets as returned by read_to_variable.
+        trading_days (pd.DatetimeIndex): dates to bucket onto, such as the
+        index of StockPlot.get_variance_data().
+        exchange_tz (str): timezone of the exchange the stock trades on.
+        close (str): local closing time of the exchange, HH:MM.
+        scores (pd.dataframe): per-tweet scores in timestamp order, such as
+        tweet_scores.load_tweet_scores returns, or None.
+
+    Returns:
+        features (pd.dataframe): dataframe indexed by trading_days with the
+        tweet count, non-reply count, and the sum and maximum of the likes
+        and retweets of the tweets in each session. Each column of scores
+        adds the sum and mean of that score. Days without tweets are zero.
+
+    Note:
+        See session_positions for how tweets are matched to sessions.
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    store = as_store(tweets)
+    trading_days = pd.DatetimeIndex(trading_days)
+    days = len(trading_days)
+    positions = session_positions(
+        store.get_timestamps(), trading_days, exchange_tz, close
+    )
+    keep = positions >= 0
+    positions = positions[keep]
+    is_reply = store.get_reply_mask()[keep]
+
+    features = {
+        "tweet_count": np.bincount(positions, minlength=days),
+        "non_reply_count": np.bincount(positions[~is_reply], minlength=days),
+    }
+    for name, values in (
+        ("likes", store.get_likes()[keep]),
+        ("retweets", store.get_retweets()[keep]),
+    ):
+        features[f"{name}_sum"] = np.bincount(
+            positions, weights=values, minlength=days
+        ).astype(np.int64)
+        maxima = np.zeros(days, dtype=np.int64)
+        np.maximum.at(maxima, positions, values)
+        features[f"{name}_max"] = maxima
+    if scores is not None:
+        counts = np.maximum(features["tweet_count"], 1)
+        for name in scores:
+            values = scores[name].to_numpy(dtype=np.float64)[keep]
+            total = np.bincount(positions, weights=values, minlength=days)
+            features[f"{name}_sum"] = total
+            features[f"{name}_mean"] = total / counts
+    return pd.DataFrame(features, index=trading_days)
 
 
 def write_to_csv(data, filename):
@@ -130,6 +861,7 @@ def write_to_csv(data, filename):
         is generally the case, but in some very rare cases (1/1000000) the
         scraper can't access very old metadata from the site.
     """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
 
     tweets_df = pd.DataFrame(
         data,
@@ -0,0 +1,374 @@
+"""Functions that run SARIMA event studies on StockPlot data"""
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import numpy as np
+import pandas as pd
+import pmdarima as pm
+import instrument
+
+# The auto_arima settings used for the event studies in main.ipynb
+ARIMA_OPTIONS = {
+    "seasonal": True,
+    "m": 12,
+    "D": 1,
+    "error_action": "ignore",
+    "suppress_warnings": True,
+    "stepwise": True,
+}
+
+
+class OrderCache:
+    """A JSON file of the SARIMA orders auto_arima picked for each ticker
+    and training window, so nearby events can reuse them instead of
+    searching again
+
+    Attributes:
+        _path = a string that is the path of the JSON file
+        _orders = a dictionary keyed by "ticker|settings" with a list of
+        entries holding the last training date, the (p,d,q) order, the
+        (P,D,Q,m) seasonal order and the AIC per training day of the fit
+
+    """
+
+    def __init__(self, path=os.path.join("cache", "arima-orders.json")):
+        self._path = path
+        self._orders = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                self._orders = json.load(file)
+
+    def find(self, key, train_end, reuse_days):
+        """Finds the cached order with the closest training window
+
+        Args:
+            key: A string from order_key.
+            train_end: A Pandas Timestamp of the last training date.
+            reuse_days: An integer number of days the cached training
+            window may end before or after train_end.
+
+        Return:
+            The closest cached entry, or None if none are close enough"""
+        best, best_gap = None, None
+        for entry in self._orders.get(key, []):
+            gap = abs((pd.Timestamp(entry["train_end"]) - train_end).days)
+            if gap <= reuse_days and (best_gap is None or gap < best_gap):
+                best, best_gap = entry, gap
+        return best
+
+    def add(self, key, train_end, order, seasonal_order, aic):
+        """Adds the order picked for a training window
+
+        Args:
+            key: A string from order_key.
+            train_end: A Pandas Timestamp of the last training date.
+            order: A tuple of the (p,d,q) order.
+            seasonal_order: A tuple of the (P,D,Q,m) seasonal order.
+            aic: A float of the fit's AIC per training day."""
+        entries = self._orders.setdefault(key, [])
+        train_end = train_end.strftime("%Y-%m-%d")
+        entries[:] = [e for e in entries if e["train_end"] != train_end]
+        entries.append(
+            {
+                "train_end": train_end,
+                "order": list(order),
+                "seasonal_order": list(seasonal_order),
+                "aic": aic,
+            }
+        )
+
+    def save(self):
+        """Writes the cached orders to the JSON file"""
+        folder = os.path.dirname(self._path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self._path, "w", encoding="utf-8") as file:
+            json.dump(self._orders, file, indent=1)
+
+
+def order_key(ticker, options):
+    """Makes the key cached orders are stored under, so orders picked
+    with different seasonal settings aren't mixed up
+
+    Args:
+        ticker: A string that is the stock's official symbol.
+        options: A dictionary of keyword arguments for pm.auto_arima.
+
+    Return:
+        A string key"""
+    return f"{ticker}|seasonal={options.get('seasonal')}|m={options.get('m')}"
+
+
+def get_train_cutoff(prices, event_date):
+    """Finds how many trading days come before an event date
+
+    Args:
+        prices: A Pandas Series of stock prices indexed by date.
+        event_date: A string of the event date in the format YYYY-MM-DD.
+
+    Return:
+        An integer number of trading days strictly before the event date,
+        which is the train_size to fit a model on"""
+    return int(prices.index.searchsorted(pd.Timestamp(event_date)))
+
+
+# pylint: disable=too-many-arguments
+def _fit_event(train, predict_step, alpha, options, orders=None):
+    """Fits a model on the prices before an event and forecasts the days
+    after it. This runs in a worker process
+
+    Args:
+        train: A numpy array of the prices before the event.
+        predict_step: An integer number of days to forecast.
+        alpha: A float which sets the confidence interval to 1 - alpha.
+        options: A dictionary of keyword arguments for pm.auto_arima.
+        orders: A tuple of a (p,d,q) order and (P,D,Q,m) seasonal order to
+        fit directly, or None to search for them with auto_arima.
+
+    Return:
+        A tuple of numpy arrays of the forecast and its confidence interval,
+        the model's (p,d,q) and (P,D,Q,m) orders, the AIC per training day,
+        and whether the orders were searched for"""
+    if orders is None:
+        model = pm.auto_arima(train, **options)
+    else:
+        model = pm.ARIMA(
+            tuple(orders[0]), tuple(orders[1]), suppress_warnings=True
+        ).fit(train)
+    forecast, conf_int = model.predict(
+        predict_step, return_conf_int=True, alpha=alpha
+    )
+    return (
+        np.asarray(forecast),
+        np.asarray(conf_int),
+        tuple(model.order),
+        tuple(model.seasonal_order),
+        model.aic() / len(train),
+        orders is None,
+    )
+
+
+def _daily_returns(prices, last_price):
+    """Calculates the daily percent variance (%) of a run of prices
+
+    Args:
+        prices: A numpy array of prices on consecutive trading days.
+        last_price: A float of the price on the day before the first one.
+
+    Return:
+        A numpy array of the percent variance of each day"""
+    previous = np.concatenate([[last_price], prices[:-1]])
+    return (prices - previous) / previous * 100
+
+
+def _event_table(ticker, event_date, prices, cutoff, fit, predict_step):
+    """Builds the tidy rows of one event study
+
+    Args:
+        ticker: A string that is the stock's official symbol.
+        event_date: A string of the event date.
+        prices: A Pandas Series of stock prices indexed by date.
+        cutoff: An integer number of trading days used for training.
+        fit: The tuple returned by _fit_event.
+        predict_step: An integer number of days forecast.
+
+    Return:
+        A Pandas Dataframe with a row for each forecast day"""
+    forecast, conf_int, order, seasonal_order, _, searched = fit
+    # Days past the end of the stock data have no actual price
+    after = prices.iloc[cutoff : cutoff + predict_step]
+    actual = np.full(predict_step, np.nan)
+    actual[: len(after)] = after.to_numpy(dtype=np.float64)
+    dates = np.full(predict_step, np.datetime64("NaT"), "datetime64[ns]")
+    dates[: len(after)] = after.index.to_numpy(dtype="datetime64[ns]")
+
+    last_price = prices.iloc[cutoff - 1]
+    abnormal = _daily_returns(actual, last_price) - _daily_returns(
+        forecast, last_price
+    )
+
+    return pd.DataFrame(
+        {
+            "ticker": ticker,
+            "event_date": pd.Timestamp(event_date),
+            "step": np.arange(1, predict_step + 1),
+            "date": dates,
+            "actual": actual,
+            "forecast": forecast,
+            "lower": conf_int[:, 0],
+            "upper": conf_int[:, 1],
+            "abnormal_return": abnormal,
+            "cumulative_abnormal_return": np.cumsum(abnormal),
+            "train_size": cutoff,
+            "order": [order] * predict_step,
+            "seasonal_order": [seasonal_order] * predict_step,
+            "searched": searched,
+        }
+    )
+
+
+def _map_fits(processes, jobs):
+    """Runs _fit_event for each job, across a pool of processes
+
+    Args:
+        processes: An integer number of worker processes. None uses one per
+        core and 1 runs every fit in this process.
+        jobs: A list of tuples of the arguments of _fit_event.
+
+    Return:
+        A list of the results of _fit_event, in the order of jobs"""
+    with instrument.span("event_study.fit", jobs=len(jobs)):
+        instrument.count("models_fit", len(jobs))
+        if processes == 1 or len(jobs) <= 1:
+            return [_fit_event(*job) for job in jobs]
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            return list(pool.map(_fit_event, *zip(*jobs)))
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def run_event_studies(
+    stocks,
+    event_dates,
+    predict_step=20,
+    alpha=0.05,
+    processes=None,
+    order_cache=None,
+    reuse_days=90,
+    refit_every=None,
+    max_aic_increase=None,
+    **arima_options,
+):
+    """Runs a SARIMA event study for every event date and stock, fitting
+    the models across a pool of processes
+
+    For each event, a model is trained on every price before the event date
+    and forecasts the predict_step trading days from the event onwards,
+    which are compared with the actual prices.
+
+    With an order_cache, the orders auto_arima picks are saved per ticker
+    and training window. Events whose training window ends within
+    reuse_days of a cached one fit that order directly instead of searching
+    again.
+
+    Args:
+        stocks: A StockPlot, or a list of StockPlots to study each event on.
+        event_dates: A list of strings of the event dates, YYYY-MM-DD.
+        predict_step: An integer number of trading days to forecast.
+        alpha: A float which sets the confidence interval to 1 - alpha.
+        processes: An integer number of worker processes. None uses one per
+        core and 1 fits every model in this process.
+        order_cache: An OrderCache to reuse and save orders in, or None to
+        search for every event's orders.
+        reuse_days: An integer number of days apart two training windows
+        can end and still share orders.
+        refit_every: An integer n so that at least every nth event of a
+        ticker (in date order) searches for its orders again, or None.
+        max_aic_increase: A float. When a reused order's AIC per training
+        day is more than this above the cached fit's, the event searches
+        for its orders again. None never searches again.
+        arima_options: Keyword arguments for pm.auto_arima, which override
+        ARIMA_OPTIONS.
+
+    Return:
+        A Pandas Dataframe with a row for each stock, event and forecast day
+        holding the date, actual price, forecast price, confidence interval,
+        abnormal return (%) and cumulative abnormal return (%), and the
+        orders used. Events with no training data before them are left
+        out"""
+    if not isinstance(stocks, (list, tuple)):
+        stocks = [stocks]
+    options = dict(ARIMA_OPTIONS, **arima_options)
+
+    # Each event of each stock, in date order per stock
+    events = []
+    for stock in stocks:
+        prices = stock.get_stock_data()
+        key = order_key(stock.get_ticker(), options)
+        reused_since_search = 0
+        # The training windows this stock will search, which later events
+        # can plan to reuse before the searches have run
+        search_ends = []
+        for event_date in sorted(event_dates, key=pd.Timestamp):
+            cutoff = get_train_cutoff(prices, event_date)
+            if cutoff == 0:
+                continue
+            train_end = prices.index[cutoff - 1]
+            # Decide up front which events search, so searches can run
+            # in parallel and the rest can reuse their orders after
+            search = (
+                order_cache is None
+                or (
+                    order_cache.find(key, train_end, reuse_days) is None
+                    and not any(
+                        abs((train_end - end).days) <= reuse_days
+                        for end in search_ends
+                    )
+                )
+                or (
+                    refit_every is not None
+                    and reused_since_search >= refit_every - 1
+                )
+            )
+            if search:
+                reused_since_search = 0
+                search_ends.append(train_end)
+            else:
+                reused_since_search += 1
+            events.append(
+                {
+                    "ticker": stock.get_ticker(),
+                    "event_date": event_date,
+                    "prices": prices,
+                    "cutoff": cutoff,
+                    "train_end": train_end,
+                    "key": key,
+                    "search": search,
+                }
+            )
+
+    def fit_all(chosen, use_cache):
+        jobs = []
+        for event in chosen:
+            orders = None
+            if use_cache:
+                entry = order_cache.find(
+                    event["key"], event["train_end"], reuse_days
+                )
+                orders = (entry["order"], entry["seasonal_order"])
+                event["cached_aic"] = entry["aic"]
+            train = event["prices"].to_numpy()[: event["cutoff"]]
+            jobs.append((train, predict_step, alpha, options, orders))
+        for event, fit in zip(chosen, _map_fits(processes, jobs)):
+            event["fit"] = fit
+            if fit[5] and order_cache is not None:
+                order_cache.add(
+                    event["key"], event["train_end"], fit[2], fit[3], fit[4]
+                )
+
+    fit_all([event for event in events if event["search"]], False)
+    reused = [event for event in events if not event["search"]]
+    fit_all(reused, True)
+    if max_aic_increase is not None:
+        degraded = [
+            event
+            for event in reused
+            if event["fit"][4] > event["cached_aic"] + max_aic_increase
+        ]
+        fit_all(degraded, False)
+    if order_cache is not None:
+        order_cache.save()
+
+    tables = [
+        _event_table(
+            event["ticker"],
+            event["event_date"],
+            event["prices"],
+            event["cutoff"],
+            event["fit"],
+            predict_step,
+        )
+        for event in events
+    ]
+    if not tables:
+        return pd.DataFrame()
+    return pd.concat(tables, ignore_index=True)
@@ -0,0 +1,38 @@
+"""
+Made up stock prices standing in for Yahoo Finance, so the tests and the
+benchmarks can run offline.
+"""
+import numpy as np
+import pandas as pd
+
+# the span of time the made up prices cover
+START_DATE = "2010-06-01"
+END_DATE = "2023-04-01"
+
+
+def price_fetch(ticker, start, end):
+    """
+    Generates made up daily prices, in the shape yfinance downloads them.
+
+    The prices of a ticker are a random walk seeded by its symbol over the
+    whole span from START_DATE to END_DATE, so the same ticker always gets
+    the same prices however a range is split up into fetches.
+
+    Args:
+        ticker (str): the stock's symbol.
+        start (str): the first date, YYYY-MM-DD.
+        end (str): the day after the last date, YYYY-MM-DD.
+
+    Returns:
+        prices (pd.dataframe): OHLCV prices for every business day.
+    """
+    index = pd.bdate_range(START_DATE, END_DATE, name="Date")
+    seed = sum(ord(character) for character in ticker)
+    steps = np.random.default_rng(seed).normal(0, 0.02, len(index))
+    close = pd.Series(100 * np.exp(np.cumsum(steps)), index)
+    close = close[(close.index >= start) & (close.index < end)]
+    prices = pd.DataFrame({name: close for name in ["Open", "High", "Low"]})
+    prices["Close"] = close
+    prices["Adj Close"] = close
+    prices["Volume"] = 1_000_000.0
+    return prices
@@ -0,0 +1,370 @@
+"""
+Lightweight timing, counters and memory sampling for slow runs.
+
+Instrumentation is off by default, in which case span() and count() return
+straight away. Turn it on for a run with enable(), or by setting the
+TWITTER_VS_STOCK_INSTRUMENT environment variable to a JSON lines path:
+
+    import instrument
+    instrument.enable("run.jsonl", profile="cprofile", memory=True)
+    ...
+    print(instrument.report())
+"""
+from contextlib import nullcontext
+import atexit
+import json
+import os
+import threading
+import time
+
+# whether spans and counters are being recorded
+_ENABLED = False
+
+# the shared do-nothing span handed out while disabled
+_NULL_SPAN = nullcontext()
+
+# everything recorded since enable(), guarded by _LOCK
+_LOCK = threading.Lock()
+_STATE = {}
+
+# the active spans of each thread, innermost last
+_LOCAL = threading.local()
+
+
+def enable(path=None, profile=None, memory=False, summary=False):
+    """
+    Starts recording spans and counters.
+
+    Args:
+        path (str): a JSON lines file to append each finished span to, or
+        None to only keep totals in memory.
+        profile (str): "cprofile" or "pyinstrument" to profile the run as
+        well, or None.
+        memory (bool): whether to record the peak memory use during each
+        span with tracemalloc, which slows the run down. Peaks cover the
+        whole process, so they include other threads' spans.
+        summary (bool): whether to print report() when Python exits.
+    """
+    global _ENABLED  # pylint: disable=global-statement
+    disable()
+    with _LOCK:
+        _STATE.clear()
+        _STATE.update(
+            started=time.perf_counter(),
+            spans={},
+            counters={},
+            file=open(path, "a", encoding="utf-8") if path else None,
+            memory=memory,
+            profiler=_start_profiler(profile),
+        )
+    if memory:
+        # pylint: disable=import-outside-toplevel
+        import tracemalloc
+
+        tracemalloc.start()
+    if summary:
+        atexit.register(_print_report)
+    _ENABLED = True
+
+
+def disable(profile_path=None):
+    """
+    Stops recording. The totals stay available to summary() and report().
+
+    Args:
+        profile_path (str): a file to save the profile to, or None to keep
+        it in summary()["profile"] only.
+    """
+    global _ENABLED  # pylint: disable=global-statement
+    if not _ENABLED:
+        return
+    _ENABLED = False
+    with _LOCK:
+        if _STATE["file"] is not None:
+            _STATE["file"].close()
+            _STATE["file"] = None
+        _STATE["elapsed"] = time.perf_counter() - _STATE["started"]
+        if _STATE["memory"]:
+            # pylint: disable=import-outside-toplevel
+            import tracemalloc
+
+            tracemalloc.stop()
+        _STATE["profile"] = _stop_profiler(_STATE["profiler"], profile_path)
+
+
+def is_enabled():
+    """
+    Checks whether instrumentation is on.
+
+    Returns:
+        enabled (bool): True while recording.
+    """
+    return _ENABLED
+
+
+def span(name, **fields):
+    """
+    Times a block of code.
+
+    Args:
+        name (str): the name to total the time under, such as
+        "csv_process.read_to_variable".
+        fields: extra values written with the span to the JSON lines file.
+
+    Returns:
+        span: a context manager timing the block, which does nothing while
+        instrumentation is off.
+    """
+    if not _ENABLED:
+        return _NULL_SPAN
+    return _Span(name, fields)
+
+
+def count(name, value=1):
+    """
+    Adds to a counter, and to the counters of the innermost active span.
+
+    Args:
+        name (str): the name of the counter, such as "tweets_scraped".
+        value (int): the amount to add.
+    """
+    if not _ENABLED:
+        return
+    stack = getattr(_LOCAL, "stack", None)
+    with _LOCK:
+        _STATE["counters"][name] = _STATE["counters"].get(name, 0) + value
+    if stack:
+        counters = stack[-1].counters
+        counters[name] = counters.get(name, 0) + value
+
+
+class _Span:
+    """
+    A timed block of code.
+
+    Attributes:
+        name: a string that is the name the time is totalled under.
+        fields: a dictionary of extra values to write with the span.
+        counters: a dictionary of the counts added while it was innermost.
+        peak: an int of the most memory traced before the latest inner
+        span reset tracemalloc's peak, or None if memory isn't sampled.
+        _start: a float of the perf_counter time the span started.
+    """
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.counters = {}
+        self.peak = None
+        self._start = None
+
+    def __enter__(self):
+        stack = getattr(_LOCAL, "stack", None)
+        if stack is None:
+            stack = _LOCAL.stack = []
+        # tracemalloc only keeps one peak, so it is restarted for each span
+        # and the peak reached so far is handed to the enclosing span
+        peak = _traced_peak(reset=True)
+        if peak is not None:
+            self.peak = 0
+            if stack and stack[-1].peak is not None:
+                stack[-1].peak = max(stack[-1].peak, peak)
+        stack.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self._start
+        _LOCAL.stack.pop()
+        peak = _traced_peak(reset=False)
+        if peak is not None and self.peak is not None:
+            peak = max(peak, self.peak)
+        else:
+            peak = None
+
+        with _LOCK:
+            if "spans" not in _STATE:
+                return
+            totals = _STATE["spans"].setdefault(
+                self.name,
+                {
+                    "calls": 0,
+                    "seconds": 0.0,
+                    "max_seconds": 0.0,
+                    "counters": {},
+                },
+            )
+            totals["calls"] += 1
+            totals["seconds"] += seconds
+            totals["max_seconds"] = max(totals["max_seconds"], seconds)
+            for name, value in self.counters.items():
+                totals["counters"][name] = (
+                    totals["counters"].get(name, 0) + value
+                )
+            if peak is not None:
+                totals["peak_bytes"] = max(totals.get("peak_bytes", 0), peak)
+            if _STATE["file"] is not None:
+                record = dict(
+                    self.fields,
+                    span=self.name,
+                    seconds=seconds,
+                    counters=self.counters,
+                    error=exc_info[0].__name__ if exc_info[0] else None,
+                )
+                if peak is not None:
+                    record["peak_bytes"] = peak
+                _STATE["file"].write(json.dumps(record, default=str) + "\n")
+                _STATE["file"].flush()
+
+
+def _traced_peak(reset):
+    """
+    Gets the most memory traced since tracemalloc's peak was last reset.
+
+    Args:
+        reset (bool): whether to restart the peak from the current memory.
+
+    Returns:
+        peak (int): the peak in bytes, or None if memory isn't sampled.
+    """
+    if not _STATE.get("memory"):
+        return None
+    # pylint: disable=import-outside-toplevel
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        return None
+    peak = tracemalloc.get_traced_memory()[1]
+    if reset:
+        tracemalloc.reset_peak()
+    return peak
+
+
+def _start_profiler(profile):
+    """
+    Starts a profiler.
+
+    Args:
+        profile (str): "cprofile", "pyinstrument" or None.
+
+    Returns:
+        profiler: the running profiler, or None.
+    """
+    # pylint: disable=import-outside-toplevel
+    if profile is None:
+        return None
+    if profile == "cprofile":
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    if profile == "pyinstrument":
+        import pyinstrument
+
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+        return profiler
+    raise ValueError(f"unknown profiler {profile!r}")
+
+
+def _stop_profiler(profiler, path):
+    """
+    Stops a profiler and gets its report.
+
+    Args:
+        profiler: the profiler from _start_profiler, or None.
+        path (str): a file to save the profile to, or None.
+
+    Returns:
+        profile (str): the text report of the profile, or None.
+    """
+    # pylint: disable=import-outside-toplevel
+    if profiler is None:
+        return None
+    if hasattr(profiler, "output_text"):
+        profiler.stop()
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(profiler.output_html())
+        return profiler.output_text()
+
+    import io
+    import pstats
+
+    profiler.disable()
+    if path is not None:
+        profiler.dump_stats(path)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(25)
+    return text.getvalue()
+
+
+def summary():
+    """
+    Gets the totals recorded since enable().
+
+    Returns:
+        summary (dict): the elapsed seconds, the counters, and for each span
+        its calls, total and longest seconds, counters and their rate per
+        second, and peak memory if sampled.
+    """
+    with _LOCK:
+        if not _STATE:
+            return {"elapsed": 0.0, "counters": {}, "spans": {}}
+        elapsed = _STATE.get("elapsed", time.perf_counter() - _STATE["started"])
+        spans = {}
+        for name, totals in _STATE["spans"].items():
+            spans[name] = dict(totals, counters=dict(totals["counters"]))
+            spans[name]["rates"] = {
+                counter: value / totals["seconds"]
+                for counter, value in totals["counters"].items()
+                if totals["seconds"] > 0
+            }
+        return {
+            "elapsed": elapsed,
+            "counters": dict(_STATE["counters"]),
+            "spans": spans,
+            "profile": _STATE.get("profile"),
+        }
+
+
+def report():
+    """
+    Formats the totals recorded since enable() as a table.
+
+    Returns:
+        report (str): a line per span, slowest first, and a line per counter.
+    """
+    totals = summary()
+    lines = [f"instrumented run: {totals['elapsed']:.3f} s"]
+    spans = sorted(
+        totals["spans"].items(),
+        key=lambda item: item[1]["seconds"],
+        reverse=True,
+    )
+    for name, span_totals in spans:
+        line = (
+            f"  {name:<40} {span_totals['calls']:>7} calls"
+            f" {span_totals['seconds']:>10.3f} s"
+        )
+        for counter, rate in span_totals["rates"].items():
+            line += f"  {counter} {rate:,.0f}/s"
+        if "peak_bytes" in span_totals:
+            line += f"  peak {span_totals['peak_bytes'] / 2**20:.1f} MiB"
+        lines.append(line)
+    for name, value in sorted(totals["counters"].items()):
+        lines.append(f"  {name:<40} {value:>12,}")
+    return "\n".join(lines)
+
+
+def _print_report():
+    """
+    Prints the report when Python exits.
+    """
+    disable()
+    print(report())
+
+
+if os.environ.get("TWITTER_VS_STOCK_INSTRUMENT"):
+    enable(os.environ["TWITTER_VS_STOCK_INSTRUMENT"], summary=True)
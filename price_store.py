@@ -0,0 +1,250 @@
+"""A local store of daily stock prices so they only download once"""
+from contextlib import closing
+from datetime import date
+import os
+import sqlite3
+import pandas as pd
+import instrument
+
+# Columns kept for every ticker, in the order yfinance names them
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+_SQL_COLUMNS = ["open", "high", "low", "close", "adj_close", "volume"]
+
+# The store StockPlot uses when it isn't given one
+_DEFAULT_STORE = None
+
+
+def yahoo_fetch(ticker, start, end):
+    """Downloads daily prices for a ticker from Yahoo Finance
+
+    Args:
+        ticker: A string that is the stock's official symbol.
+        start: A string of the first date to download, YYYY-MM-DD.
+        end: A string of the day after the last date to download,
+        YYYY-MM-DD.
+
+    Return:
+        A Pandas Dataframe of the PRICE_COLUMNS indexed by date. It is
+        empty if the download failed.
+    """
+    # yfinance is slow to import, so it is only loaded for a download
+    import yfinance as yahooFinance  # pylint: disable=import-outside-toplevel
+
+    prices = yahooFinance.download(
+        ticker, start=start, end=end, auto_adjust=False, progress=False
+    )
+    # Newer versions of yfinance add the ticker as a second column level
+    if isinstance(prices.columns, pd.MultiIndex):
+        prices.columns = prices.columns.get_level_values(0)
+    return prices
+
+
+class PriceStore:
+    """A SQLite file holding the daily OHLCV prices of many tickers,
+    which tops itself up from a fetch backend when asked for dates it
+    doesn't have yet.
+
+    Attributes:
+        _path = a string that is the path of the SQLite file
+        _fetch = a function that takes a ticker, start date and end date
+        (YYYY-MM-DD strings, end exclusive) and returns a Pandas Dataframe
+        of PRICE_COLUMNS indexed by date. Defaults to yahoo_fetch.
+
+    """
+
+    def __init__(self, path, fetch=yahoo_fetch):
+        self._path = path
+        self._fetch = fetch
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS prices (ticker TEXT, date TEXT,"
+                f" {', '.join(f'{name} REAL' for name in _SQL_COLUMNS)},"
+                " PRIMARY KEY (ticker, date))"
+            )
+            # The span of dates already fetched for each ticker. Days in the
+            # span without a price (weekends, holidays) aren't fetched again
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS coverage"
+                " (ticker TEXT PRIMARY KEY, start TEXT, end TEXT)"
+            )
+
+    def _connect(self):
+        """Opens a connection to the SQLite file. A new connection is
+        opened for each operation so a store can be shared across threads
+
+        Return:
+            A context manager which commits and closes the connection"""
+        connection = sqlite3.connect(self._path, timeout=30)
+        return _Transaction(connection)
+
+    def get_coverage(self, ticker):
+        """Gets the span of dates already fetched for a ticker
+
+        Args:
+            ticker: A string that is the stock's official symbol.
+
+        Return:
+            A tuple of the first date and the day after the last date as
+            YYYY-MM-DD strings, or None if nothing has been fetched"""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT start, end FROM coverage WHERE ticker = ?", (ticker,)
+            ).fetchone()
+        return row
+
+    def get_prices(self, ticker, start_date, end_date, refresh=False):
+        """Gets the daily prices of a ticker between two dates, fetching
+        only the dates before or after the span already stored
+
+        Args:
+            ticker: A string that is the stock's official symbol.
+            start_date: A string of the first date, YYYY-MM-DD.
+            end_date: A string of the day after the last date, YYYY-MM-DD.
+            refresh: A boolean which when True fetches the whole range again
+            and replaces the stored prices.
+
+        Return:
+            A Pandas Dataframe of the PRICE_COLUMNS indexed by date. It is
+            empty if the dates are invalid or no prices could be found.
+            If the fetch backend fails (for example with no network), the
+            stored prices are returned as they are."""
+        try:
+            start = pd.Timestamp(str(start_date)).strftime("%Y-%m-%d")
+            end = pd.Timestamp(str(end_date)).strftime("%Y-%m-%d")
+        except ValueError:
+            return _empty_prices()
+        if start >= end:
+            return _empty_prices()
+
+        with instrument.span("price_store.get_prices", ticker=ticker):
+            coverage = None if refresh else self.get_coverage(ticker)
+            if coverage is None:
+                self._top_up(ticker, start, end)
+            elif coverage[0] <= start and end <= coverage[1]:
+                instrument.count("price_cache_hits")
+            else:
+                # Fetch up to the stored span so it stays contiguous
+                if start < coverage[0]:
+                    self._top_up(ticker, start, coverage[0])
+                if end > coverage[1]:
+                    self._top_up(ticker, coverage[1], end)
+
+            return self._read(ticker, start, end)
+
+    def _top_up(self, ticker, start, end):
+        """Fetches prices for a span of dates and adds them to the store
+
+        Args:
+            ticker: A string that is the stock's official symbol.
+            start: A string of the first date to fetch, YYYY-MM-DD.
+            end: A string of the day after the last date, YYYY-MM-DD."""
+        instrument.count("price_cache_misses")
+        try:
+            with instrument.span("price_store.fetch", ticker=ticker):
+                prices = self._fetch(ticker, start, end)
+        except Exception:  # pylint: disable=broad-except
+            # Offline or a broken backend: serve what is already stored
+            return
+        if prices is None or prices.empty:
+            return
+
+        prices = prices.reindex(columns=PRICE_COLUMNS)
+        dates = pd.DatetimeIndex(prices.index)
+        if dates.tz is not None:
+            dates = dates.tz_localize(None)
+        rows = zip(
+            [ticker] * len(prices),
+            dates.strftime("%Y-%m-%d"),
+            *[prices[name].astype(float).tolist() for name in PRICE_COLUMNS],
+        )
+        # Today's prices may still change, so only mark up to today covered
+        covered_end = min(end, date.today().strftime("%Y-%m-%d"))
+
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            coverage = connection.execute(
+                "SELECT start, end FROM coverage WHERE ticker = ?", (ticker,)
+            ).fetchone()
+            if coverage is not None:
+                start = min(start, coverage[0])
+                covered_end = max(covered_end, coverage[1])
+            connection.execute(
+                "INSERT OR REPLACE INTO coverage VALUES (?, ?, ?)",
+                (ticker, start, covered_end),
+            )
+
+    def _read(self, ticker, start, end):
+        """Reads the stored prices of a ticker between two dates
+
+        Args:
+            ticker: A string that is the stock's official symbol.
+            start: A string of the first date, YYYY-MM-DD.
+            end: A string of the day after the last date, YYYY-MM-DD.
+
+        Return:
+            A Pandas Dataframe of the PRICE_COLUMNS indexed by date"""
+        with self._connect() as connection:
+            prices = pd.read_sql_query(
+                f"SELECT date, {', '.join(_SQL_COLUMNS)} FROM prices"
+                " WHERE ticker = ? AND date >= ? AND date < ? ORDER BY date",
+                connection,
+                params=(ticker, start, end),
+            )
+        prices.index = pd.DatetimeIndex(
+            pd.to_datetime(prices.pop("date")), name="Date"
+        )
+        prices.columns = PRICE_COLUMNS
+        return prices.astype(float)
+
+
+class _Transaction:
+    """Commits a SQLite connection's changes and closes it on exit
+
+    Attributes:
+        _connection = the sqlite3 connection to manage
+
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def __enter__(self):
+        return self._connection
+
+    def __exit__(self, *exc_info):
+        with closing(self._connection):
+            if exc_info[0] is None:
+                self._connection.commit()
+            else:
+                self._connection.rollback()
+
+
+def _empty_prices():
+    """Makes an empty price Dataframe
+
+    Return:
+        A Pandas Dataframe with the PRICE_COLUMNS and no dates"""
+    return pd.DataFrame(
+        columns=PRICE_COLUMNS,
+        index=pd.DatetimeIndex([], name="Date"),
+        dtype=float,
+    )
+
+
+def get_default_store():
+    """Gets the store StockPlot uses when it isn't given one, which is
+    saved in the cache folder
+
+    Return:
+        The default PriceStore"""
+    global _DEFAULT_STORE  # pylint: disable=global-statement
+    if _DEFAULT_STORE is None:
+        _DEFAULT_STORE = PriceStore(os.path.join("cache", "prices.sqlite"))
+    return _DEFAULT_STORE
@@ -1,7 +1,227 @@
 """A class that organizes all the stock data """
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-import yfinance as yahooFinance
-from sklearn import preprocessing
+from price_store import get_default_store
+import instrument
+
+
+def percent_variance(prices):
+    """Calculates the percent variance (%) of prices between consecutive
+    dates for one or many tickers at once
+
+    Args:
+        prices: A Pandas Series of prices for one ticker, or a Pandas
+        Dataframe with a column of prices for each ticker, indexed by date.
+
+    Return:
+        A Pandas Series or Dataframe (matching the input) of the percent
+        variance between each date and the one before it, indexed by every
+        date except the first
+    """
+    values = np.asarray(prices, dtype=np.float64)
+    deltas = (values[1:] - values[:-1]) / values[:-1] * 100
+    if isinstance(prices, pd.DataFrame):
+        return pd.DataFrame(deltas, prices.index[1:], prices.columns)
+    return pd.Series(deltas, prices.index[1:])
+
+
+def nearest_positions(index, dates):
+    """Finds the position of the nearest trading day to each date in a
+    sorted date index with a binary search
+
+    Args:
+        index: A sorted Pandas DatetimeIndex of trading days.
+        dates: A list of dates, as strings in the format YYYY-MM-DD or
+        anything else Pandas can convert to dates.
+
+    Return:
+        A numpy array with the position in index of the nearest trading day
+        to each date. Dates that fall before the first or after the last
+        trading day get -1. A date exactly between two trading days snaps
+        to the later one.
+    """
+    dates = pd.DatetimeIndex(pd.to_datetime(dates))
+    if len(index) == 0:
+        return np.full(len(dates), -1)
+    stamps = index.values
+    targets = dates.values.astype(stamps.dtype)
+    after = np.clip(np.searchsorted(stamps, targets), 1, len(stamps) - 1)
+    before = after - 1
+    if len(stamps) == 1:
+        after = before = np.zeros(len(targets), dtype=np.int64)
+    # snap to whichever neighbour is closer, preferring the later one
+    nearest = np.where(
+        targets - stamps[before] < stamps[after] - targets, before, after
+    )
+    outside = (targets < stamps[0]) | (targets > stamps[-1])
+    return np.where(outside, -1, nearest)
+
+
+def screen_abnormal_drops(
+    variance, target, benchmarks, drop=-2, benchmark_floor=-0.4, decimals=2
+):
+    """Flags the dates when a stock dropped sharply while its benchmarks
+    didn't, using boolean masks over the whole variance table at once
+
+    Args:
+        variance: A Pandas Dataframe of percent variance with a column for
+        each ticker, like StockUniverse.get_variance_data() or the
+        pd.concat of StockPlot.get_variance_data() series.
+        target: A string of the column of the stock to screen.
+        benchmarks: A list of strings of the columns to compare against.
+        drop: A number that the target's percent variance must be below
+        for a date to be flagged.
+        benchmark_floor: A number that every benchmark's percent variance
+        must be at or above for a date to be flagged.
+        decimals: An integer number of decimals to round the percent
+        variances to before comparing them.
+
+    Return:
+        A Pandas Dataframe indexed by flagged date, ranked from the biggest
+        drop to the smallest, with the previous trading day, the target's
+        and benchmarks' percent variance, the year, and the number of
+        flagged dates in that year"""
+    columns = [target] + list(benchmarks)
+    raw = variance[columns].to_numpy(dtype=np.float64)
+    values = np.round(raw, decimals)
+    flagged = (values[:, 0] < drop) & np.all(
+        values[:, 1:] >= benchmark_floor, axis=1
+    )
+    positions = np.flatnonzero(flagged)
+    positions = positions[np.argsort(raw[positions, 0], kind="stable")]
+
+    dates = variance.index
+    previous = np.where(positions > 0, positions - 1, 0)
+    years = dates[positions].year.to_numpy()
+    _, year_index, year_counts = np.unique(
+        years, return_inverse=True, return_counts=True
+    )
+
+    screened = pd.DataFrame(
+        raw[positions],
+        pd.DatetimeIndex(dates[positions], name="date"),
+        columns,
+    )
+    screened.insert(
+        0,
+        "previous_date",
+        dates[previous].where(positions > 0, pd.NaT),
+    )
+    screened["year"] = years
+    screened["year_count"] = year_counts[year_index]
+    return screened
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def market_model_returns(
+    variance,
+    targets,
+    benchmark,
+    event_dates,
+    estimation_window=120,
+    event_window=(0, 5),
+    gap=0,
+):
+    """Runs a market model event study for every event and target at once.
+    Each target's alpha and beta against the benchmark are estimated by
+    least squares over the trading days before each event, all as one
+    batch of numpy sums instead of a regression per event
+
+    Args:
+        variance: A Pandas Dataframe of percent variance with a column for
+        each ticker, like StockUniverse.get_variance_data() or the
+        pd.concat of StockPlot.get_variance_data() series.
+        targets: A string or list of strings of the columns to study.
+        benchmark: A string of the column of the market to compare against.
+        event_dates: A list of strings of the event dates, YYYY-MM-DD. Day 0
+        of an event is the first trading day on or after its date.
+        estimation_window: An integer number of trading days before the
+        event to estimate alpha and beta over.
+        event_window: A tuple of the first and last day (relative to day 0)
+        to measure abnormal returns on.
+        gap: An integer number of trading days left out between the
+        estimation window and the event window.
+
+    Return:
+        A Pandas Dataframe with a row for each event, target and day of the
+        event window holding the actual, expected and abnormal return (%),
+        the cumulative abnormal return (%) since the start of the event
+        window, their t-statistics, and the alpha and beta of the model.
+        Events whose windows don't fit in the data are left out"""
+    if isinstance(targets, str):
+        targets = [targets]
+    targets = list(targets)
+    first, last = event_window
+    days = np.arange(first, last + 1)
+
+    dates = variance.index
+    event_dates = pd.DatetimeIndex(pd.to_datetime(event_dates))
+    positions = dates.searchsorted(event_dates)
+    fits = (positions + first - gap - estimation_window >= 0) & (
+        positions + last < len(dates)
+    )
+    event_dates, positions = event_dates[fits], positions[fits]
+
+    market = variance[benchmark].to_numpy(dtype=np.float64)
+    returns = variance[targets].to_numpy(dtype=np.float64)
+
+    # (events, estimation days) and (events, event days) row numbers
+    start = positions + first - gap - estimation_window
+    estimation_rows = start[:, None] + np.arange(estimation_window)
+    event_rows = positions[:, None] + days
+
+    # Least squares of y = alpha + beta * x for every event and target,
+    # skipping days either return is missing
+    x = market[estimation_rows][:, :, None]
+    y = returns[estimation_rows]
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x = np.where(valid, x, 0)
+    y = np.where(valid, y, 0)
+    count = valid.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = x.sum(axis=1) / count
+        y_mean = y.sum(axis=1) / count
+        x_dev = np.where(valid, x - x_mean[:, None], 0)
+        y_dev = np.where(valid, y - y_mean[:, None], 0)
+        x_squares = (x_dev**2).sum(axis=1)
+        beta = (x_dev * y_dev).sum(axis=1) / x_squares
+        alpha = y_mean - beta * x_mean
+        residuals = y_dev - beta[:, None] * x_dev
+        sigma2 = (residuals**2).sum(axis=1) / (count - 2)
+
+        # (events, event days, targets) abnormal returns
+        event_market = market[event_rows][:, :, None]
+        expected = alpha[:, None] + beta[:, None] * event_market
+        actual = returns[event_rows]
+        abnormal = actual - expected
+        cumulative = np.nancumsum(abnormal, axis=1)
+        # the forecast error variance of each day's abnormal return
+        ar_variance = sigma2[:, None] * (
+            1
+            + 1 / count[:, None]
+            + (event_market - x_mean[:, None]) ** 2 / x_squares[:, None]
+        )
+        t_stat = abnormal / np.sqrt(ar_variance)
+        car_t_stat = cumulative / np.sqrt(np.cumsum(ar_variance, axis=1))
+
+    shape = abnormal.shape
+    return pd.DataFrame(
+        {
+            "event_date": np.repeat(event_dates.values, shape[1] * shape[2]),
+            "ticker": np.tile(targets, shape[0] * shape[1]),
+            "day": np.tile(np.repeat(days, shape[2]), shape[0]),
+            "date": np.repeat(dates.values[event_rows].ravel(), shape[2]),
+            "return": actual.ravel(),
+            "expected_return": expected.ravel(),
+            "abnormal_return": abnormal.ravel(),
+            "cumulative_abnormal_return": cumulative.ravel(),
+            "t_stat": t_stat.ravel(),
+            "car_t_stat": car_t_stat.ravel(),
+            "alpha": np.repeat(alpha, shape[1], axis=0).ravel(),
+            "beta": np.repeat(beta, shape[1], axis=0).ravel(),
+        }
+    )
 
 
 class StockPlot:
@@ -14,20 +234,69 @@ class StockPlot:
         of time we want to scrape between. Format is YYYY-MM-DD
         _end_date = a string that is the end date for the range
         of time we want to scrape between. Format is YYYY-MM-DD
+        _store = the PriceStore the prices are read from, which only
+        downloads from Yahoo Finance the dates it doesn't have yet
+        _price_data = A Pandas Dataframe which contains the date &
+        the open, high, low, close, adjusted close and volume values
+        ranging from the _start_date to the _end_date
         _stock_data = A Pandas Dataframe which contains the
         date & stock closing value web-scraped from Yahoo
         Finance ranging from the _start_date to the _end_date
+        _derived = a dictionary which caches the series derived from
+        _stock_data (normalized, variance, ...) by name, so each is
+        only computed once per download
 
     """
 
-    def __init__(self, stock_name, start_date, end_date):
+    def __init__(self, stock_name, start_date, end_date, store=None):
         self._ticker = stock_name
         self._start_date = start_date
         self._end_date = end_date
+        self._store = store if store is not None else get_default_store()
+        self._derived = {}
 
-        self._stock_data = yahooFinance.download(
-            self._ticker, start=str(self._start_date), end=str(self._end_date)
-        ).Close
+        self._set_price_data(
+            self._store.get_prices(
+                self._ticker, self._start_date, self._end_date
+            )
+        )
+
+    def refresh_data(self):
+        """Downloads the stock prices again and clears every derived
+        series that was computed from the old prices"""
+        self._set_price_data(
+            self._store.get_prices(
+                self._ticker, self._start_date, self._end_date, refresh=True
+            )
+        )
+
+    def _set_price_data(self, price_data):
+        """Replaces the stock prices and clears the derived series
+
+        Args:
+            price_data: A Pandas Dataframe of daily OHLCV prices."""
+        self._price_data = price_data
+        self._stock_data = price_data.Close
+        self._derived.clear()
+
+    def _get_derived(self, name, compute):
+        """Gets a series derived from the stock data, computing it
+        on the first call and caching it until the data is refreshed
+
+        Args:
+            name: A string which names the derived series in the cache.
+            compute: A function with no arguments which computes the
+            series from the stock data.
+
+        Return:
+            The derived series"""
+        if name not in self._derived:
+            instrument.count("derived_cache_misses")
+            with instrument.span("stock_plot.derive", series=name):
+                self._derived[name] = compute()
+        else:
+            instrument.count("derived_cache_hits")
+        return self._derived[name]
 
     # Getter Methods
     def get_stock_data(self):
@@ -38,6 +307,14 @@ class StockPlot:
         the date and the raw stock closing prices"""
         return self._stock_data
 
+    def get_price_data(self):
+        """A getter method for the full price data
+
+        Return:
+            A Panda Dataframe that contains the date and the open, high,
+        low, close, adjusted close and volume values"""
+        return self._price_data
+
     def get_ticker(self):
         """A getter method for the stock ticker symbol
 
@@ -53,19 +330,14 @@ class StockPlot:
             A Pandas dataframe which contains the percent variance between
             two dates
         """
-        deltas = [0]
-
         if data_type == "raw":
             prices_array = self.get_stock_data()
         if data_type == "normalized":
             prices_array = self.get_normalized_data()
 
-        for i in range(1, len(prices_array)):
-            delta_price = prices_array[i] - prices_array[i - 1]
-            delta_price = delta_price / prices_array[i - 1]
-            deltas.append(delta_price * 100)
-
-        return pd.Series(deltas[1:], self._stock_data.index[1:])
+        return self._get_derived(
+            f"variance-{data_type}", lambda: percent_variance(prices_array)
+        )
 
     def get_normalized_data(self):
         """Scales the values of stocks to between 0-1 while preserving
@@ -75,8 +347,18 @@ class StockPlot:
             A Pandas dataframe which contains the normalized version
              of the stock's closing prices
         """
+        return self._get_derived("normalized", self._compute_normalized_data)
+
+    def _compute_normalized_data(self):
+        """Computes the normalized stock data for get_normalized_data
+
+        Return:
+            A Pandas series of the normalized closing prices
+        """
         prices_array = self._stock_data.values
-        normalized_prices = preprocessing.normalize([prices_array])[0]
+        # scale to a unit L2 norm, leaving all zero prices as they are
+        norm = np.sqrt(np.sum(prices_array**2))
+        normalized_prices = prices_array / (norm if norm else 1)
         return pd.Series(normalized_prices, self._stock_data.index)
 
     def get_range_date(self, interest_date, range_date=9, type="raw"):
@@ -96,37 +378,234 @@ class StockPlot:
         Return:
             A Pandas Dataframe which contains stock & date data with a
             total length range_date *2 +1 with the date in the middle
-            being the interest_date.
+            being the nearest trading day to the interest_date. Weekends
+            and holidays snap to the closest trading day.
             If the interest_date is not in the self._stock_data range
-            then it will return None"""
+            then it prints a message and returns the whole Dataframe"""
+        dataframe = self._get_typed_data(type)
+
+        position = nearest_positions(dataframe.index, [interest_date])[0]
+        if position < 0:
+            print("The date of interest is not in the range of stock data")
+            return dataframe
+
+        # Makes sure the parameters don't start in the
+        # negative index.
+        first_date = max(position - range_date, 0)
+        # Makes sure the parameters don't go over index. The +1
+        # compensates for the nature of string splicing
+        last_date = min(position + range_date + 1, len(dataframe))
+
+        return dataframe.iloc[first_date:last_date]
+
+    def get_range_dates(self, interest_dates, range_date=9, type="raw"):
+        """Gets the range of dates & stock prices around each of many
+        dates of interest at once
+
+        Args:
+            interest_dates: A list of strings which represent the dates
+            of interest in the format YYYY-MM-DD.
+            range_date: An integer number n which represents number of dates
+            n days before and n days after each interest_date
+            type: A string which identifies what "overall stock data"
+            we're looking at: raw, normalized, or variance.
 
+        Return:
+            A Pandas Series with a MultiIndex of (interest date, date)
+            holding every window stacked in the order of interest_dates.
+            Dates of interest outside of the stock data range are left out,
+            and ones that aren't trading days snap to the nearest one."""
+        dataframe = self._get_typed_data(type)
+        positions = nearest_positions(dataframe.index, interest_dates)
+        keys = np.asarray(interest_dates, dtype=object)[positions >= 0]
+        positions = positions[positions >= 0]
+
+        # A row of positions for each window, with the ends clipped
+        window = positions[:, None] + np.arange(-range_date, range_date + 1)
+        valid = (window >= 0) & (window < len(dataframe))
+        rows = window[valid]
+        owners = np.broadcast_to(keys[:, None], window.shape)[valid]
+
+        stacked = dataframe.iloc[rows]
+        stacked.index = pd.MultiIndex.from_arrays(
+            [owners, dataframe.index[rows]], names=["interest_date", "date"]
+        )
+        return stacked
+
+    def _get_typed_data(self, type):
+        """Gets the raw, normalized or variance stock data by name
+
+        Args:
+            type: A string which is one of raw, normalized or variance. Any
+            other value prints a warning and gives the raw stock data.
+
+        Return:
+            The chosen Pandas series"""
+        # Only the chosen type of data is computed
         df_types = {
-            "raw": self.get_stock_data(),
-            "normalized": self.get_normalized_data(),
-            "variance": self.get_variance_data(),
+            "raw": self.get_stock_data,
+            "normalized": self.get_normalized_data,
+            "variance": self.get_variance_data,
         }
 
         # Error Catches
         try:
-            dataframe = df_types[type]
+            get_dataframe = df_types[type]
         except KeyError:
             print(
                 f"{type} is an invalid type argument value. You can choose from"
                 " raw, normalized, or variance. type arguement will default to"
                 " raw stock data"
             )
-            dataframe = df_types["raw"]
+            get_dataframe = df_types["raw"]
+        return get_dataframe()
+
+
+class StockUniverse:
+    """A group of tickers loaded together and held as one aligned
+    array of closing prices with a shared date index
+
+    Attributes:
+        _tickers = a list of strings that are the stocks' official symbols
+        _start_date = a string that is start date for the range
+        of time we want to scrape between. Format is YYYY-MM-DD
+        _end_date = a string that is the end date for the range
+        of time we want to scrape between. Format is YYYY-MM-DD
+        _dates = a Pandas DatetimeIndex of every date any ticker traded on
+        _prices = a 2-D numpy float64 array of closing prices with a row
+        for each date and a column for each ticker. Dates a ticker didn't
+        trade on are NaN
+        _derived = a dictionary which caches the frames derived from
+        _prices by name
+
+    """
+
+    def __init__(
+        self, stock_names, start_date, end_date, store=None, max_workers=8
+    ):
+        self._tickers = list(stock_names)
+        self._start_date = start_date
+        self._end_date = end_date
+        self._derived = {}
+
+        store = store if store is not None else get_default_store()
+        with instrument.span(
+            "stock_plot.StockUniverse", tickers=len(self._tickers)
+        ), ThreadPoolExecutor(max_workers=max_workers) as pool:
+            closes = list(
+                pool.map(
+                    lambda ticker: store.get_prices(
+                        ticker, start_date, end_date
+                    ).Close,
+                    self._tickers,
+                )
+            )
+
+        self._dates = pd.DatetimeIndex([], name="Date")
+        for close in closes:
+            self._dates = self._dates.union(close.index)
+        self._prices = np.full((len(self._dates), len(closes)), np.nan)
+        for column, close in enumerate(closes):
+            rows = self._dates.get_indexer(close.index)
+            self._prices[rows, column] = close.to_numpy(dtype=np.float64)
+
+    # Getter Methods
+    def get_tickers(self):
+        """A getter method for the stock ticker symbols
+
+        Return:
+            A list of the stock ticker symbols, in column order"""
+        return self._tickers
+
+    def get_dates(self):
+        """A getter method for the shared date index
+
+        Return:
+            A Pandas DatetimeIndex of every date any ticker traded on"""
+        return self._dates
+
+    def get_price_array(self):
+        """A getter method for the aligned closing prices
+
+        Return:
+            A 2-D numpy array with a row for each date and a column for
+            each ticker"""
+        return self._prices
+
+    def get_stock_data(self):
+        """Gets the raw stock closing prices of every ticker
+
+        Return:
+            A Pandas Dataframe with a column of closing prices for each
+            ticker"""
+        return pd.DataFrame(self._prices, self._dates, self._tickers)
+
+    def get_normalized_data(self):
+        """Scales the values of each stock the same way
+        StockPlot.get_normalized_data does
+
+        Return:
+            A Pandas Dataframe with a column of normalized closing prices
+            for each ticker"""
+        if "normalized" not in self._derived:
+            norms = np.sqrt(np.nansum(self._prices**2, axis=0))
+            self._derived["normalized"] = pd.DataFrame(
+                self._prices / np.where(norms == 0, 1, norms),
+                self._dates,
+                self._tickers,
+            )
+        return self._derived["normalized"]
 
-        for i in range(len(dataframe) - 1):
-            if dataframe[i : i + 1].index == interest_date:
-                # Makes sure the parameters don't start in the
-                # negative index.
-                first_date = max(i - range_date, 0)
-                # Makes sure the parameters don't go over index. The +1
-                # compensates for the nature of string splicing
-                last_date = min(i + range_date + 1, len(dataframe))
+    def get_variance_data(self):
+        """Calculates the percent variance (%) of each stock's closing
+        prices between the dates it traded on
 
-                return dataframe[first_date:last_date]
+        Return:
+            A Pandas Dataframe with a column of percent variance for each
+            ticker. A ticker's change is measured from the last date it
+            traded on, and is NaN on dates it didn't trade on"""
+        if "variance" not in self._derived:
+            previous = self.get_stock_data().ffill().to_numpy()[:-1]
+            deltas = (self._prices[1:] - previous) / previous * 100
+            self._derived["variance"] = pd.DataFrame(
+                deltas, self._dates[1:], self._tickers
+            )
+        return self._derived["variance"]
+
+    def screen_drops(self, target, benchmarks=None, **thresholds):
+        """Flags the dates when one ticker dropped sharply while the others
+        didn't, see screen_abnormal_drops
+
+        Args:
+            target: A string of the ticker to screen.
+            benchmarks: A list of strings of the tickers to compare
+            against. Defaults to every other ticker.
+            thresholds: The drop, benchmark_floor and decimals arguments
+            of screen_abnormal_drops.
 
-        print("The date of interest is not in the range of stock data")
-        return dataframe
+        Return:
+            A Pandas Dataframe of the flagged dates, ranked from the biggest
+            drop to the smallest"""
+        if benchmarks is None:
+            benchmarks = [name for name in self._tickers if name != target]
+        return screen_abnormal_drops(
+            self.get_variance_data(), target, benchmarks, **thresholds
+        )
+
+    def market_model(self, targets, benchmark, event_dates, **windows):
+        """Runs a market model event study of tickers against a benchmark
+        ticker, see market_model_returns
+
+        Args:
+            targets: A string or list of strings of the tickers to study.
+            benchmark: A string of the ticker of the market.
+            event_dates: A list of strings of the event dates, YYYY-MM-DD.
+            windows: The estimation_window, event_window and gap arguments
+            of market_model_returns.
+
+        Return:
+            A Pandas Dataframe of the abnormal returns of each event, target
+            and day"""
+        return market_model_returns(
+            self.get_variance_data(), targets, benchmark, event_dates, **windows
+        )
@@ -0,0 +1,47 @@
+"""
+testing the benchmark suite on a tiny archive so it stays runnable
+"""
+import json
+import os
+import pandas as pd
+import benchmark
+
+
+def test_tweet_archive():
+    """
+    Tests that generated archives are repeatable and newest first.
+    """
+    archive = benchmark.tweet_archive(1000, seed=3)
+    assert archive.equals(benchmark.tweet_archive(1000, seed=3))
+    assert list(archive.columns) == [
+        "date and time",
+        "content",
+        "like count",
+        "retweet count",
+    ]
+    dates = pd.to_datetime(archive["date and time"])
+    assert dates.is_monotonic_decreasing
+
+
+def test_run_benchmarks(tmp_path):
+    """
+    Tests that every benchmark runs offline and the results are saved.
+    """
+    path = str(tmp_path / "results.json")
+    results = benchmark.run_benchmarks(sizes=[2000], tickers=2, repeat=1)
+    benchmark.save_results(results, path)
+
+    with open(path, "r", encoding="utf-8") as file:
+        report = json.load(file)
+    names = {result["name"] for result in report["results"]}
+    assert {
+        "read_to_variable",
+        "show_tweets_on",
+        "get_tweets_around",
+        "StockPlot.get_variance_data",
+        "StockPlot.get_normalized_data",
+        "StockPlot.get_range_date",
+        "screen_abnormal_drops",
+    } <= names
+    assert all(result["min"] >= 0 for result in report["results"])
+    assert not os.path.exists("raw-data/bench2000-all-tweets.csv")
@@ -0,0 +1,141 @@
+"""
+Tests for the event study functions. The stock prices are made up offline
+and the models are fit without seasonality so the tests run quickly.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import event_study
+from event_study import (
+    OrderCache,
+    get_train_cutoff,
+    order_key,
+    run_event_studies,
+)
+from fake_prices import price_fetch
+from price_store import PriceStore
+from stock_plot import StockPlot
+
+
+@pytest.fixture
+def tesla(tmp_path):
+    """A StockPlot of made up prices for a year.
+
+    Return:
+        The StockPlot"""
+    store = PriceStore(str(tmp_path / "prices.sqlite"), price_fetch)
+    return StockPlot("TSLA", "2020-01-01", "2021-01-01", store=store)
+
+
+def test_get_train_cutoff(tesla):
+    """Tests that the train cutoff counts the trading days before an
+    event, including events on weekends.
+
+    Args:
+        tesla: The fixture of made up stock prices."""
+    prices = tesla.get_stock_data()
+    # 2020-06-06 is a saturday, so friday the 5th is the last train day
+    cutoff = get_train_cutoff(prices, "2020-06-06")
+    assert prices.index[cutoff - 1] == pd.Timestamp("2020-06-05")
+    assert prices.index[cutoff] == pd.Timestamp("2020-06-08")
+
+
+def test_run_event_studies(tesla):
+    """Tests that every event gets a forecast table lined up with the
+    actual prices after the event.
+
+    Args:
+        tesla: The fixture of made up stock prices."""
+    events = ["2020-06-06", "2020-12-20", "2019-01-01"]
+    table = run_event_studies(
+        tesla, events, predict_step=10, processes=2, seasonal=False
+    )
+    prices = tesla.get_stock_data()
+
+    # the event before the stock data has nothing to train on
+    assert list(table["event_date"].unique()) == list(
+        pd.to_datetime(events[:2])
+    )
+    june = table[table["event_date"] == "2020-06-06"]
+    assert list(june["date"]) == list(prices["2020-06-08":].index[:10])
+    assert np.allclose(june["actual"], prices["2020-06-08":].iloc[:10])
+    assert (june["lower"] <= june["forecast"]).all()
+    assert (june["forecast"] <= june["upper"]).all()
+    assert np.allclose(
+        june["cumulative_abnormal_return"],
+        june["abnormal_return"].cumsum(),
+    )
+
+    # the december event runs past the end of the stock data
+    december = table[table["event_date"] == "2020-12-20"]
+    assert december["actual"].isna().sum() == 10 - len(prices["2020-12-20":])
+
+
+def test_order_cache(tesla, tmp_path):
+    """Tests that cached orders are saved, reused by nearby events and
+    searched for again every refit_every events.
+
+    Args:
+        tesla: The fixture of made up stock prices.
+        tmp_path: A pytest fixture of a temporary folder."""
+    path = str(tmp_path / "orders.json")
+    events = ["2020-06-05", "2020-06-12", "2020-06-19", "2020-11-02"]
+    table = run_event_studies(
+        tesla,
+        events,
+        predict_step=5,
+        processes=1,
+        order_cache=OrderCache(path),
+        reuse_days=30,
+        seasonal=False,
+    )
+    searched = table.groupby("event_date")["searched"].first()
+    # november is too far from june to reuse its orders
+    assert list(searched) == [True, False, False, True]
+    first = table[table["event_date"] == "2020-06-05"]["order"].iloc[0]
+    reused = table[table["event_date"] == "2020-06-19"]["order"].iloc[0]
+    assert reused == first
+
+    # the saved orders are reused by a new run, except every 2nd event
+    cache = OrderCache(path)
+    key = order_key("TSLA", dict(seasonal=False, m=12))
+    assert cache.find(key, pd.Timestamp("2020-06-10"), 7) is not None
+    table = run_event_studies(
+        tesla,
+        events,
+        predict_step=5,
+        processes=1,
+        order_cache=cache,
+        reuse_days=30,
+        refit_every=2,
+        seasonal=False,
+    )
+    searched = table.groupby("event_date")["searched"].first()
+    assert list(searched) == [False, True, False, True]
+
+
+def test_failed_search(tesla, tmp_path, monkeypatch):
+    """Tests that a search that fails leaves nothing in the order cache
+    for the next run to reuse.
+
+    Args:
+        tesla: The fixture of made up stock prices.
+        tmp_path: A pytest fixture of a temporary folder.
+        monkeypatch: A pytest fixture to make the fits fail with."""
+
+    def failing_fits(*_):
+        raise RuntimeError("fit failed")
+
+    cache = OrderCache(str(tmp_path / "orders.json"))
+    events = ["2020-06-05", "2020-06-12"]
+    options = dict(predict_step=5, processes=1, seasonal=False)
+    with monkeypatch.context() as patch:
+        patch.setattr(event_study, "_map_fits", failing_fits)
+        with pytest.raises(RuntimeError):
+            run_event_studies(tesla, events, order_cache=cache, **options)
+    key = order_key("TSLA", dict(seasonal=False, m=12))
+    assert cache.find(key, pd.Timestamp("2020-06-05"), 30) is None
+
+    table = run_event_studies(tesla, events, order_cache=cache, **options)
+    searched = table.groupby("event_date")["searched"].first()
+    assert list(searched) == [True, False]
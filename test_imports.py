@@ -0,0 +1,112 @@
+"""
+testing that importing the modules stays fast
+
+Each module is imported in a fresh interpreter with python -X importtime,
+so the measurement doesn't depend on what the test run already imported.
+"""
+
+import os
+import subprocess
+import sys
+import pytest
+
+# libraries that should only load once a function needs them
+HEAVY = {"pandas", "sklearn", "snscrape", "yfinance", "pmdarima"}
+
+
+def import_times(module):
+    """
+    Imports a module in a fresh interpreter and reads its import times.
+
+    Args:
+        module (str): the name of the module to import.
+
+    Returns:
+        times (dict): the cumulative import time in seconds of every module
+        that was imported, keyed by module name.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative) / 1_000_000
+    return times
+
+
+@pytest.mark.parametrize(
+    "module, budget, allowed",
+    [
+        # numpy is the only library needed to import these
+        ("csv_process", 0.5, set()),
+        ("twitscrape", 0.5, set()),
+        # the stock classes are built on pandas
+        ("stock_plot", 1.5, {"pandas"}),
+    ],
+)
+def test_import_budget(module, budget, allowed):
+    """
+    Tests that a module imports within its time budget, without loading
+    the heavy libraries it only needs in some functions.
+
+    Args:
+        module (str): the name of the module to import.
+        budget (float): the most seconds importing it may take.
+        allowed (set): heavy libraries the module may load on import.
+    """
+    times = import_times(module)
+    loaded = {name.split(".")[0] for name in times}
+    assert not (loaded & HEAVY) - allowed
+    assert times[module] < budget
+
+
+# scrapes many fake handles at once in an interpreter that hasn't loaded
+# pandas yet, so the threads are the first to import it
+THREADED_SCRAPE = """
+import datetime, os, sys
+from types import SimpleNamespace
+import batch_scrape, twitscrape
+
+assert "pandas.core.frame" not in sys.modules
+os.chdir(sys.argv[1])
+os.makedirs("raw-data")
+newest = datetime.datetime(2023, 3, 1, tzinfo=datetime.timezone.utc)
+twitscrape._user_items = lambda handle: iter(
+    SimpleNamespace(
+        date=newest - datetime.timedelta(hours=i),
+        rawContent=f"{handle} {i}",
+        likeCount=i,
+        retweetCount=i,
+    )
+    for i in range(30)
+)
+handles = [f"user{i}" for i in range(16)]
+progress = batch_scrape.scrape_handles(
+    handles, max_workers=16, rate=1000, burst=1000, retries=0
+).get_progress()
+failed = {h: p["error"] for h, p in progress.items() if p["status"] != "done"}
+assert not failed, failed
+"""
+
+
+def test_threads_import_pandas(tmp_path):
+    """
+    Tests that scraper threads can all be the first to need pandas.
+
+    Args:
+        tmp_path: a pytest fixture of a temporary folder.
+    """
+    subprocess.run(
+        [sys.executable, "-c", THREADED_SCRAPE, str(tmp_path)],
+        check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=dict(
+            os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__))
+        ),
+    )
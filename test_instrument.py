@@ -0,0 +1,102 @@
+"""
+testing the instrumentation layer
+"""
+import json
+import pytest
+import instrument
+from csv_process import read_to_variable
+
+
+@pytest.fixture
+def recording(tmp_path):
+    """
+    Turns instrumentation on for a test, writing spans to a temporary file.
+
+    Yields:
+        path: the path of the JSON lines file.
+    """
+    path = tmp_path / "spans.jsonl"
+    instrument.enable(str(path), profile="cprofile", memory=True)
+    yield path
+    instrument.disable()
+
+
+def test_disabled():
+    """
+    Tests that nothing is recorded while instrumentation is off.
+    """
+    instrument.disable()
+    assert not instrument.is_enabled()
+    first, second = instrument.span("a"), instrument.span("b")
+    assert first is second
+    with first:
+        instrument.count("rows_parsed", 10)
+
+
+def test_spans_and_counters(recording):
+    """
+    Tests that spans total their time and the counts made inside them.
+
+    Args:
+        recording: the fixture turning instrumentation on.
+    """
+    for _ in range(3):
+        with instrument.span("outer", size=2):
+            instrument.count("items", 2)
+            with instrument.span("inner"):
+                instrument.count("items", 5)
+    instrument.disable()
+
+    totals = instrument.summary()
+    assert totals["counters"] == {"items": 21}
+    assert totals["spans"]["outer"]["calls"] == 3
+    assert totals["spans"]["outer"]["counters"] == {"items": 6}
+    assert totals["spans"]["inner"]["counters"] == {"items": 15}
+    assert totals["spans"]["outer"]["peak_bytes"] >= 0
+    assert totals["profile"]
+    assert "inner" in instrument.report()
+
+    with open(recording, "r", encoding="utf-8") as file:
+        records = [json.loads(line) for line in file]
+    assert [record["span"] for record in records] == ["inner", "outer"] * 3
+    assert records[1]["size"] == 2
+
+
+def test_read_to_variable_counters(recording):
+    """
+    Tests that reading an archive counts its rows and bytes.
+
+    Args:
+        recording: the fixture turning instrumentation on.
+    """
+    rows = read_to_variable("elonmusk")
+    counters = instrument.summary()["counters"]
+    assert counters["rows_parsed"] == len(rows)
+    assert counters["bytes_read"] > 0
+
+
+def test_nested_peaks(recording):
+    """
+    Tests that each span records the peak memory used while it ran.
+
+    An outer span's peak should include memory it used before its inner
+    spans, and an inner span's peak shouldn't include memory the outer
+    span used before it started.
+
+    Args:
+        recording: the fixture turning instrumentation on.
+    """
+    with instrument.span("outer"):
+        data = bytearray(8 * 2**20)
+        del data
+        with instrument.span("inner"):
+            inner = bytearray(2**20)
+            del inner
+        with instrument.span("inner"):
+            pass
+    with instrument.span("after"):
+        pass
+    spans = instrument.summary()["spans"]
+    assert spans["outer"]["peak_bytes"] >= 8 * 2**20
+    assert 2**20 <= spans["inner"]["peak_bytes"] < 4 * 2**20
+    assert spans["after"]["peak_bytes"] < 4 * 2**20
@@ -5,23 +5,48 @@ There are very few aspects to test here, simply that the data is maintained
 throughout.
 """
 from datetime import datetime, timedelta
+import csv
+import os
 import pytest
-from csv_process import read_to_variable, show_tweets_on, get_tweets_around
+import numpy as np
+import pandas as pd
+import csv_process
+from csv_process import (
+    read_to_variable,
+    show_tweets_on,
+    get_tweets_around,
+    get_tweets_around_dates,
+    daily_tweet_features,
+    load_tweet_store,
+    stream_tweets_around,
+    iter_tweet_chunks,
+)
 
 # all tests will be based on elon musk's processed data
 NAME = "elonmusk"
 
 
+@pytest.fixture(scope="module")
+def tweets():
+    """
+    Reads elon musk's tweets once for every test that uses them.
+
+    Returns:
+        tweets (list): list of tweets as returned by read_to_variable.
+    """
+    return read_to_variable(NAME)
+
+
 @pytest.mark.parametrize(
-    "tweets, dates",
+    "dates",
     [
         # test date with same month and day
-        (read_to_variable(NAME), "12-12-2021"),
+        "12-12-2021",
         # test year with duplicate characters
-        (read_to_variable(NAME), "01-01-2020"),
+        "01-01-2020",
         # test older dates (scraper functionality)
-        (read_to_variable(NAME), "12-31-2017"),
-        (read_to_variable(NAME), "06-13-2014"),
+        "12-31-2017",
+        "06-13-2014",
     ],
 )
 def test_show_tweets_on(tweets, dates):
@@ -48,17 +73,17 @@ def test_show_tweets_on(tweets, dates):
 
 
 @pytest.mark.parametrize(
-    "tweet_list, mid_date, search_range",
+    "mid_date, search_range",
     [
         # check when day and month are the same
-        (read_to_variable(NAME), "2021-12-12", 3),
+        ("2021-12-12", 3),
         # check when range extends into different month
-        (read_to_variable(NAME), "2020-02-01", 6),
+        ("2020-02-01", 6),
         # check for when range extends into different year
-        (read_to_variable(NAME), "2018-12-29", 9),
+        ("2018-12-29", 9),
     ],
 )
-def test_get_tweets_around(tweet_list, mid_date, search_range):
+def test_get_tweets_around(tweets, mid_date, search_range):
     """
     Tests if all the tweets lie in the correct date range
 
@@ -68,13 +93,13 @@ def test_get_tweets_around(tweet_list, mid_date, search_range):
     if each tweet in the list lies in the date overall search range.
 
     Args:
-        tweet_list (list): list of tweets to search through.
+        tweets (list): list of tweets to search through.
         mid_date (str): date to search around.
         search_range (int): number of days to search around the mid_date.
     """
 
     # define tweet list
-    tweets_around_list = get_tweets_around(tweet_list, mid_date, search_range)
+    tweets_around_list = get_tweets_around(tweets, mid_date, search_range)
 
     # convert input date to datetime object
     input_date_obj = datetime.strptime(mid_date, "%Y-%m-%d")
@@ -91,3 +116,267 @@ def test_get_tweets_around(tweet_list, mid_date, search_range):
         tweet_date_obj = datetime.strptime(date, "%Y-%m-%d")
 
         assert max_past_date <= tweet_date_obj <= max_future_date
+
+
+def test_tweet_store_sorted():
+    """
+    Tests that the tweet store keeps every tweet and sorts their timestamps.
+
+    The binary searches used by the store only work on sorted timestamps, so
+    this checks the order of the parsed column and that no rows were lost.
+    """
+    store = load_tweet_store(NAME)
+    timestamps = store.get_timestamps()
+    assert len(store) == len(read_to_variable(NAME)) - 1
+    assert np.all(timestamps[:-1] <= timestamps[1:])
+
+
+@pytest.mark.parametrize(
+    "mid_date, search_range",
+    [
+        # window on the newest tweet in the archive
+        ("2023-03-29", 1),
+        # window on the oldest tweet in the archive
+        ("2010-06-04", 1),
+        # window entirely outside the archive
+        ("2005-01-01", 5),
+    ],
+)
+def test_tweet_store_matches_list(mid_date, search_range):
+    """
+    Tests that querying the store gives the same tweets as the list wrapper.
+
+    Args:
+        mid_date (str): date to search around.
+        search_range (int): number of days to search around the mid_date.
+    """
+    store = load_tweet_store(NAME)
+    tweets = read_to_variable(NAME)
+    assert store.tweets_around(mid_date, search_range) == get_tweets_around(
+        tweets, mid_date, search_range
+    )
+
+
+def test_list_changed_in_place():
+    """
+    Tests that the list wrappers see a list changed in place between calls,
+    even when its length stays the same.
+    """
+    tweets = [
+        ["date and time", "content", "like count", "retweet count"],
+        ["2020-01-02 10:00:00+00:00", "hello", "1", "2"],
+        ["2020-01-01 10:00:00+00:00", "world", "3", "4"],
+    ]
+    assert show_tweets_on(tweets, "01-02-2020") == [tweets[1]]
+    tweets[1] = ["2020-01-03 10:00:00+00:00", "moved", "5", "6"]
+    assert show_tweets_on(tweets, "01-02-2020") == []
+    assert show_tweets_on(tweets, "01-03-2020") == [tweets[1]]
+
+
+def test_tweet_store_cache(tmp_path, monkeypatch):
+    """
+    Tests that the cached tweet store is reused until the raw csv changes.
+
+    A small archive is written to a temporary folder. Loading it twice should
+    give the same tweets from the cache, and rewriting the csv should cause the
+    cached copy to be rebuilt.
+    """
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("raw-data")
+    path = "raw-data/test-all-tweets.csv"
+    header = "date and time,content,like count,retweet count\n"
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(header + "2020-01-02 10:00:00+00:00,hello,1,2\n")
+
+    first = load_tweet_store("test")
+    assert os.path.exists("cache/tweets/test-all-tweets/meta.json")
+    assert load_tweet_store("test", use_cache=True) is first
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(
+            header
+            + "2020-01-03 10:00:00+00:00,world,3,4\n"
+            + "2020-01-02 10:00:00+00:00,hello,1,2\n"
+        )
+    os.utime(path, ns=(0, 0))
+    second = load_tweet_store("test")
+    assert len(second) == 2
+    assert second.tweets_on("01-03-2020") == [
+        ["2020-01-03 10:00:00+00:00", "world", "3", "4"]
+    ]
+    assert list(second.get_likes()) == [1, 3]
+
+
+def test_tweet_store_rebuild(tmp_path, monkeypatch):
+    """
+    Tests that rebuilding the cache doesn't change a store already mapped
+    from it.
+
+    The rebuilt archive is smaller, so overwriting the mapped files in place
+    would leave the old store reading past their end.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(csv_process, "_TWEET_STORES", {})
+    os.makedirs("raw-data")
+    path = "raw-data/test-all-tweets.csv"
+    header = "date and time,content,like count,retweet count\n"
+    rows = [
+        f"2020-01-01 {hour:02}:{minute:02}:00+00:00,tweet {hour} {minute},1,2\n"
+        for hour in range(24)
+        for minute in range(60)
+    ]
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(header + "".join(reversed(rows)))
+    load_tweet_store("test")
+    monkeypatch.setattr(csv_process, "_TWEET_STORES", {})
+    old = load_tweet_store("test")
+    expected = [old.get_row(i) for i in range(len(old))]
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(header + rows[0])
+    os.utime(path, ns=(0, 0))
+    assert len(load_tweet_store("test")) == 1
+    assert [old.get_row(i) for i in range(len(old))] == expected
+    assert len(expected) == 24 * 60
+    assert os.listdir("cache/tweets") == ["test-all-tweets"]
+
+
+def test_get_tweets_around_dates():
+    """
+    Tests that the batch query finds the same tweets as one query per date.
+
+    Each event's tweets in the long dataframe are compared against the list
+    returned by get_tweets_around for the same date and range.
+    """
+    tweets = read_to_variable(NAME)
+    dates = ["2018-07-16", "2018-08-09", "2021-11-08", "2005-01-01"]
+    tweets_df = get_tweets_around_dates(tweets, dates, 2)
+
+    for event_id, mid_date in enumerate(dates):
+        expected = get_tweets_around(tweets, mid_date, 2)
+        found = tweets_df[tweets_df["event_id"] == event_id]
+        assert sorted(found["content"]) == sorted(row[1] for row in expected)
+
+
+@pytest.mark.parametrize(
+    "mid_date, search_range",
+    [
+        # window in the middle of the archive
+        ("2018-08-09", 2),
+        # window at the oldest end of the archive
+        ("2010-06-04", 1),
+    ],
+)
+def test_stream_tweets_around(mid_date, search_range):
+    """
+    Tests that streaming the csv finds the same tweets as the loaded list.
+
+    Args:
+        mid_date (str): date to search around.
+        search_range (int): number of days to search around the mid_date.
+    """
+    assert stream_tweets_around(NAME, mid_date, search_range) == (
+        get_tweets_around(read_to_variable(NAME), mid_date, search_range)
+    )
+
+
+@pytest.fixture
+def oldest_first(tmp_path):
+    """
+    Writes a copy of elon musk's archive sorted oldest first.
+
+    Returns:
+        folder: the temporary folder holding the copy's raw-data folder.
+    """
+    with open(
+        f"raw-data/{NAME}-all-tweets.csv", "r", encoding="utf-8", newline=""
+    ) as file:
+        rows = list(csv.reader(file))
+    os.mkdir(tmp_path / "raw-data")
+    with open(
+        tmp_path / "raw-data" / f"{NAME}-all-tweets.csv",
+        "w",
+        encoding="utf-8",
+        newline="",
+    ) as file:
+        csv.writer(file).writerows([rows[0]] + rows[:0:-1])
+    return tmp_path
+
+
+def test_iter_tweet_chunks(oldest_first, monkeypatch):
+    """
+    Tests that reading the csv in chunks finds the same tweets as streaming
+    it row by row, whichever order the csv is in.
+
+    Args:
+        oldest_first: the fixture of an oldest first copy of the archive.
+        monkeypatch: a pytest fixture to change directory with.
+    """
+    mid_date, search_range = datetime(2018, 8, 9), timedelta(days=2)
+    expected = stream_tweets_around(NAME, "2018-08-09", 2)
+    window = {
+        "start": mid_date - search_range,
+        "end": mid_date + search_range,
+        "chunksize": 1000,
+    }
+    chunks = list(iter_tweet_chunks(NAME, newest_first=True, **window))
+    found = pd.concat(chunks)
+    assert list(found["content"]) == [row[1] for row in expected]
+
+    # the same archive oldest first must be read to the end
+    monkeypatch.chdir(oldest_first)
+    found = pd.concat(iter_tweet_chunks(NAME, **window))
+    assert list(found["content"]) == [row[1] for row in reversed(expected)]
+
+
+def test_stream_tweets_around_oldest_first(oldest_first, monkeypatch):
+    """
+    Tests that streaming an oldest first csv finds the same tweets, in its
+    order, when told the csv isn't newest first.
+
+    Args:
+        oldest_first: the fixture of an oldest first copy of the archive.
+        monkeypatch: a pytest fixture to change directory with.
+    """
+    expected = stream_tweets_around(NAME, "2018-08-09", 2)
+    assert len(expected) > 0
+    monkeypatch.chdir(oldest_first)
+    found = stream_tweets_around(NAME, "2018-08-09", 2, newest_first=False)
+    assert found == expected[::-1]
+
+
+def test_daily_tweet_features():
+    """
+    Tests that tweets are bucketed onto the session they could first move.
+
+    Tweets after the close, on weekends and on the daylight saving switch
+    are checked against the New York close.
+    """
+    header = ["date and time", "content", "like count", "retweet count"]
+    rows = [
+        header,
+        # before the previous close, left out
+        ["2021-03-01 12:00:00+00:00", "too early", "1", "1"],
+        # 15:00 in New York on friday
+        ["2021-03-05 20:00:00+00:00", "friday", "10", "1"],
+        # 16:30 on friday and saturday roll forward to monday
+        ["2021-03-05 21:30:00+00:00", "@someone after close", "5", "2"],
+        ["2021-03-06 15:00:00+01:00", "saturday", "7", "3"],
+        # 15:30 and 16:30 daylight saving time
+        ["2021-03-15 19:30:00+00:00", "before close", "2", "0"],
+        ["2021-03-15 20:30:00+00:00", "after close", "4", "9"],
+        # after the last close, left out
+        ["2021-03-20 12:00:00+00:00", "too late", "1", "1"],
+    ]
+    days = pd.to_datetime(
+        ["2021-03-05", "2021-03-08", "2021-03-15", "2021-03-16"]
+    )
+    features = daily_tweet_features(rows, days)
+
+    assert list(features.index) == list(days)
+    assert list(features["tweet_count"]) == [1, 2, 1, 1]
+    assert list(features["non_reply_count"]) == [1, 1, 1, 1]
+    assert list(features["likes_sum"]) == [10, 12, 2, 4]
+    assert list(features["likes_max"]) == [10, 7, 2, 4]
+    assert list(features["retweets_sum"]) == [1, 5, 0, 9]
+    assert list(features["retweets_max"]) == [1, 3, 0, 9]
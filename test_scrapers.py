@@ -9,7 +9,28 @@ starter functions tested below.
 """
 # import twitscrape tests
 import datetime
-from twitscrape import get_tweet, get_tweet_data
+import os
+import time
+from types import SimpleNamespace
+import pandas as pd
+import pytest
+import twitscrape
+from batch_scrape import TokenBucket, scrape_handles
+from twitscrape import (
+    get_tweet,
+    get_tweet_data,
+    update_all_tweets,
+    scrape_filtered,
+    filter_archive,
+    in_month,
+    hour_at_most,
+    on_year,
+    get_tweets_after,
+    get_tweets_on_year,
+    get_tweets_in_month,
+    get_all_tweets,
+    TweetWriter,
+)
 
 # using the twitter handle of the ex-CEO to test
 NAME = "jack"
@@ -57,3 +78,394 @@ def test_get_tweet_data():
     assert isinstance(likes, int)
     # check if the retweets value is an integer.
     assert isinstance(retweets, int)
+
+
+def make_tweets(count, newest="2023-03-01 12:00:00+00:00"):
+    """
+    Makes synthetic tweets standing in for snscrape tweet objects.
+
+    Args:
+        count (int) : number of tweets to make.
+        newest (str) : time of the first tweet. Each later tweet is an hour
+        older.
+
+    Returns:
+        tweets (list) : tweets newest first, with the attributes the scrapers
+        use.
+    """
+    newest = datetime.datetime.fromisoformat(newest)
+    user = SimpleNamespace(statusesCount=count)
+    return [
+        SimpleNamespace(
+            id=count - i,
+            date=newest - datetime.timedelta(hours=i),
+            rawContent=f"tweet {count - i}",
+            likeCount=i,
+            retweetCount=2 * i,
+            viewCount=3 * i,
+            user=user,
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def fake_twitter(monkeypatch, tmp_path):
+    """
+    Runs the scrapers offline in a temporary folder.
+
+    The user timeline and search scrapers are replaced with lists of tweets
+    that tests can fill in.
+
+    Returns:
+        timeline (dict) : "user" list of tweets returned for a user's timeline
+        and "search" list of tweets returned for a search, plus "queries"
+        made.
+    """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "raw-data").mkdir()
+    timeline = {"user": [], "search": [], "queries": []}
+
+    def search_items(query):
+        timeline["queries"].append(query)
+        return iter(timeline["search"])
+
+    monkeypatch.setattr(
+        twitscrape, "_user_items", lambda handle: iter(timeline["user"])
+    )
+    monkeypatch.setattr(twitscrape, "_search_items", search_items)
+    return timeline
+
+
+def read_contents(handle):
+    """
+    Reads the contents of the tweets in a user's all-tweets csv, in order.
+
+    Args:
+        handle (str) : handle of the user.
+
+    Returns:
+        contents (list) : content of every tweet in the csv.
+    """
+    tweets_df = pd.read_csv(f"raw-data/{handle}-all-tweets.csv")
+    return list(tweets_df["content"])
+
+
+def test_update_all_tweets(fake_twitter):
+    """
+    Tests that updating only adds tweets newer than the stored ones.
+
+    A pinned tweet older than everything else is put at the top of the
+    timeline to check that it doesn't stop the crawl early.
+    """
+    tweets = make_tweets(10)
+    fake_twitter["user"] = tweets[5:]
+    update_all_tweets("fake")
+    assert read_contents("fake") == [tweet.rawContent for tweet in tweets[5:]]
+
+    pinned = tweets[-1]
+    fake_twitter["user"] = [pinned] + tweets
+    new_tweets = update_all_tweets("fake")
+    assert list(new_tweets["content"]) == [
+        tweet.rawContent for tweet in tweets[:5]
+    ]
+    assert read_contents("fake") == [tweet.rawContent for tweet in tweets]
+
+
+def test_update_all_tweets_resume(fake_twitter):
+    """
+    Tests that an interrupted crawl resumes from where it stopped.
+
+    The first crawl fails part way through the timeline. The second should
+    search for the tweets older than the last one written, and the final csv
+    should hold every tweet once.
+    """
+    tweets = make_tweets(10)
+
+    def failing_timeline():
+        yield from tweets[:4]
+        raise ConnectionError("lost connection")
+
+    fake_twitter["user"] = failing_timeline()
+    with pytest.raises(ConnectionError):
+        update_all_tweets("fake")
+
+    fake_twitter["search"] = tweets[3:]
+    update_all_tweets("fake")
+    assert fake_twitter["queries"] == ["from:fake until:2023-03-02"]
+    assert read_contents("fake") == [tweet.rawContent for tweet in tweets]
+
+
+def test_update_all_tweets_resume_pinned(fake_twitter):
+    """
+    Tests that a pinned tweet at the top of an interrupted crawl isn't
+    taken as the point to resume from.
+
+    The pinned tweet is the oldest in the partial csv, so resuming from it
+    would skip every tweet between it and where the crawl stopped.
+    """
+    tweets = make_tweets(100)
+    pinned = tweets[-1]
+
+    def failing_timeline():
+        yield pinned
+        yield from tweets[:30]
+        raise ConnectionError("lost connection")
+
+    fake_twitter["user"] = failing_timeline()
+    with pytest.raises(ConnectionError):
+        update_all_tweets("fake")
+
+    fake_twitter["search"] = tweets[29:]
+    update_all_tweets("fake")
+    assert fake_twitter["queries"] == ["from:fake until:2023-03-01"]
+    # the pinned tweet is kept where the timeline put it, and only once
+    assert read_contents("fake") == [pinned.rawContent] + [
+        tweet.rawContent for tweet in tweets[:-1]
+    ]
+
+
+def test_scrape_filtered(fake_twitter):
+    """
+    Tests that one crawl writes the output of every filter.
+
+    The timeline can only be iterated once, so every filter has to be applied
+    in the same pass. Filtering the archive should give the same outputs.
+    """
+    tweets = make_tweets(24 * 80)
+    fake_twitter["user"] = tweets
+    filters = {
+        "in-Feb": in_month("Feb"),
+        "before-6": hour_at_most(6),
+        "in-2023": on_year(2023),
+    }
+    scraped = scrape_filtered("fake", filters)
+
+    for name, predicate in filters.items():
+        expected = [
+            tweet.rawContent
+            for tweet in tweets
+            if predicate(tweet.date, tweet.rawContent)
+        ]
+        assert len(expected) > 0
+        assert list(scraped[name]["content"]) == expected
+
+    fake_twitter["user"] = tweets
+    update_all_tweets("fake")
+    archived = filter_archive("fake", filters)
+    for name, tweets_df in archived.items():
+        assert tweets_df.equals(scraped[name])
+
+
+def test_scrape_handles(fake_twitter, monkeypatch):
+    """
+    Tests that many handles are scraped in parallel into their own archives.
+
+    Each fake timeline waits a little per tweet, and one of them fails on its
+    first attempt so that it has to be retried from its partial csv.
+    """
+    handles = ["alpha", "beta", "gamma", "delta"]
+    timelines = {handle: make_tweets(30) for handle in handles}
+    failed = []
+
+    def user_items(handle):
+        for i, tweet in enumerate(timelines[handle]):
+            if handle == "beta" and i == 10 and not failed:
+                failed.append(handle)
+                raise ConnectionError("rate limited")
+            time.sleep(0.001)
+            yield tweet
+
+    def search_items(query):
+        handle = query.split()[0][len("from:") :]
+        return iter(timelines[handle])
+
+    monkeypatch.setattr(twitscrape, "_user_items", user_items)
+    monkeypatch.setattr(twitscrape, "_search_items", search_items)
+    slept = []
+    progress = scrape_handles(
+        handles, max_workers=4, rate=1000, burst=100, sleep=slept.append
+    ).get_progress()
+
+    for handle in handles:
+        assert read_contents(handle) == [
+            tweet.rawContent for tweet in timelines[handle]
+        ]
+        assert progress[handle]["status"] == "done"
+        assert progress[handle]["tweets_per_second"] > 0
+    assert progress["beta"]["attempts"] == 2
+    # the retry reads the tweet it stopped on again, then the older ones
+    assert progress["beta"]["tweets"] == 10 + 21
+    assert progress["alpha"]["attempts"] == 1
+    # only the failed scrape waited, for the first backoff
+    assert slept == [1.0]
+
+
+@pytest.mark.parametrize("count", [12, 10])
+def test_update_all_tweets_pages(fake_twitter, monkeypatch, count):
+    """
+    Tests that a token is taken before each page of tweets is read from
+    the scraper, rather than after it has been fetched, and that the token
+    of the empty page ending a timeline is given back.
+
+    Args:
+        count (int) : number of tweets in the timeline.
+    """
+    tweets = make_tweets(count)
+    events = []
+
+    def user_items(handle):
+        for tweet in tweets:
+            events.append(tweet.rawContent)
+            yield tweet
+
+    bucket = SimpleNamespace(
+        acquire=lambda: events.append("page"),
+        release=lambda: events.append("release"),
+    )
+    monkeypatch.setattr(twitscrape, "_user_items", user_items)
+    update_all_tweets("fake", bucket=bucket, page_size=5)
+    contents = [tweet.rawContent for tweet in tweets]
+    pages = [contents[start : start + 5] for start in range(0, count, 5)]
+    expected = [event for page in pages for event in ["page"] + page]
+    if count % 5 == 0:
+        expected += ["page", "release"]
+    assert events == expected
+
+
+def test_token_bucket():
+    """
+    Tests that the token bucket allows a burst and then waits for tokens.
+
+    A fake clock is used which only moves forward when the bucket sleeps.
+    """
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=2, capacity=3, sleep=sleep, clock=lambda: now[0])
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.acquire(2) == pytest.approx(1.0)
+    assert now[0] == pytest.approx(1.5)
+
+    # a token given back can be taken again without waiting
+    bucket.release()
+    assert bucket.acquire() == 0
+
+
+@pytest.mark.parametrize("year", [2022, "2022"])
+def test_get_tweets_on_year(fake_twitter, year):
+    """
+    Tests that scraping a year stops once the timeline passes that year.
+
+    A pinned tweet from before the year is put at the top of the timeline to
+    check that it doesn't stop the scrape before it starts.
+
+    Args:
+        year (int or str) : year to scrape, which may be given either way.
+    """
+    tweets = make_tweets(24 * 1000, newest="2023-03-01 00:00:00+00:00")
+    read = []
+
+    def timeline():
+        for tweet in [tweets[-1]] + tweets:
+            read.append(tweet)
+            yield tweet
+
+    fake_twitter["user"] = timeline()
+    tweets_df = get_tweets_on_year("fake", year)
+    expected = [tweet for tweet in tweets if tweet.date.year == 2022]
+
+    assert list(tweets_df["content"]) == [
+        tweet.rawContent for tweet in expected
+    ]
+    # the pinned tweet, the tweets of 2023 and 2022, then two from 2021
+    assert len(read) == 1 + tweets.index(expected[-1]) + 1 + 2
+
+
+@pytest.mark.parametrize("year", [2021, "2021"])
+def test_get_tweets_after(fake_twitter, year):
+    """
+    Tests that scraping the tweets after a year stops once it is reached.
+
+    Args:
+        year (int or str) : year to scrape after, which may be given either
+        way.
+    """
+    tweets = make_tweets(24 * 1000, newest="2023-03-01 00:00:00+00:00")
+    read = []
+
+    def timeline():
+        for tweet in tweets:
+            read.append(tweet)
+            yield tweet
+
+    fake_twitter["user"] = timeline()
+    tweets_df = get_tweets_after("fake", year)
+    expected = [tweet for tweet in tweets if tweet.date.year > 2021]
+
+    assert list(tweets_df["content"]) == [
+        tweet.rawContent for tweet in expected
+    ]
+    # the tweets of 2023 and 2022, then two from 2021
+    assert len(read) == len(expected) + 2
+
+
+def test_get_tweets_in_month_bounds(fake_twitter):
+    """
+    Tests that a month can be scraped within a date range.
+    """
+    tweets = make_tweets(24 * 1000, newest="2023-03-01 00:00:00+00:00")
+    fake_twitter["user"] = tweets
+    tweets_df = get_tweets_in_month("fake", "Feb", since="2022-01-01")
+    expected = [
+        tweet.rawContent
+        for tweet in tweets
+        if tweet.date.month == 2 and tweet.date.year >= 2022
+    ]
+    assert list(tweets_df["content"]) == expected
+
+
+def test_tweet_writer_batches(fake_twitter):
+    """
+    Tests that tweets are written in batches while a scrape runs.
+
+    Rows should be readable from the csv once a batch fills, and a scrape that
+    crashes should keep every tweet read before the crash in the partial csv
+    without touching the stored one.
+    """
+    with TweetWriter("raw-data/batch.csv", ["a", "b"], flush_every=2) as writer:
+        writer.write([1, 2])
+        assert len(pd.read_csv("raw-data/batch.csv")) == 0
+        writer.write([3, 4])
+        assert len(pd.read_csv("raw-data/batch.csv")) == 2
+        writer.write([5, 6])
+    assert len(pd.read_csv("raw-data/batch.csv")) == 3
+
+    tweets = make_tweets(250)
+    fake_twitter["user"] = tweets[100:]
+    get_all_tweets("fake")
+    stored = [tweet.rawContent for tweet in tweets[100:]]
+
+    def failing_timeline():
+        yield from tweets[:150]
+        raise ConnectionError("lost connection")
+
+    fake_twitter["user"] = failing_timeline()
+    with pytest.raises(ConnectionError):
+        get_all_tweets("fake")
+    assert read_contents("fake") == stored
+    partial_df = pd.read_csv("raw-data/fake-all-tweets.partial.csv")
+    assert list(partial_df["content"]) == [
+        tweet.rawContent for tweet in tweets[:150]
+    ]
+
+    fake_twitter["user"] = tweets
+    tweets_df = get_all_tweets("fake")
+    assert list(tweets_df["content"]) == [tweet.rawContent for tweet in tweets]
+    assert tweets_df["date and time"][0] == tweets[0].date
+    assert not os.path.exists("raw-data/fake-all-tweets.partial.csv")
+    with open("raw-data/fake-all-tweets.csv", "rb") as file:
+        assert b"\r" not in file.read()
@@ -5,8 +5,11 @@ need to create an instance of it for testing
 purposes
 
 """
+import numpy as np
 import pytest
 import stock_plot as sp
+import price_store
+from fake_prices import price_fetch
 import pandas as pd
 import yfinance as yahooFinance
 from sklearn import preprocessing
@@ -83,3 +86,211 @@ def test_get_stock_data(stock, key):
     # Stock retrieval was unsuccessful if
     # stock.get_stock_data() is an empty Series
     assert test_stock.get_stock_data().empty == key
+
+
+@pytest.fixture
+def offline(monkeypatch, tmp_path):
+    """Replaces the default price store with one in a temporary folder
+    which fetches from fake_prices.price_fetch.
+
+    Return:
+        The list of (ticker, start, end) fetches made by the store"""
+    fetches = []
+
+    def fetch(ticker, start, end):
+        fetches.append((ticker, start, end))
+        return price_fetch(ticker, start, end)
+
+    store = price_store.PriceStore(str(tmp_path / "prices.sqlite"), fetch)
+    monkeypatch.setattr(price_store, "_DEFAULT_STORE", store)
+    return fetches
+
+
+def test_get_variance_data(offline):
+    """Tests that the vectorized percent variance matches computing each
+    day's change one at a time, for one ticker and for many tickers at once.
+
+    Args:
+        offline: The fixture which stubs out Yahoo Finance."""
+    stock = sp.StockPlot("TSLA", "2020-01-01", "2021-01-01")
+    prices = stock.get_stock_data()
+    expected = [
+        (prices.iloc[i] - prices.iloc[i - 1]) / prices.iloc[i - 1] * 100
+        for i in range(1, len(prices))
+    ]
+    variance = stock.get_variance_data()
+    assert variance.index.equals(prices.index[1:])
+    assert np.allclose(variance.values, expected)
+
+    nasdaq = sp.StockPlot("^NDX", "2020-01-01", "2021-01-01")
+    frame = pd.concat(
+        [prices, nasdaq.get_stock_data()], axis=1, keys=["TSLA", "^NDX"]
+    )
+    variance_frame = sp.percent_variance(frame)
+    assert list(variance_frame.columns) == ["TSLA", "^NDX"]
+    assert np.allclose(variance_frame["TSLA"].values, expected)
+
+
+def test_derived_data_cache(offline):
+    """Tests that derived series are only computed once per download
+    and are recomputed after the stock data is refreshed.
+
+    Args:
+        offline: The fixture which stubs out Yahoo Finance."""
+    stock = sp.StockPlot("TSLA", "2020-01-01", "2021-01-01")
+    variance = stock.get_variance_data()
+    normalized = stock.get_normalized_data()
+    assert stock.get_variance_data() is variance
+    assert stock.get_normalized_data() is normalized
+
+    stock.refresh_data()
+    assert stock.get_variance_data() is not variance
+    assert stock.get_variance_data().equals(variance)
+
+
+@pytest.mark.parametrize(
+    "interest_date, expected",
+    [
+        # a trading day in the middle of the data
+        ("2020-06-10", "2020-06-10"),
+        # a saturday snaps back to the friday before
+        ("2020-06-13", "2020-06-12"),
+        # a sunday snaps forward to the monday after
+        ("2020-06-14", "2020-06-15"),
+        # the very last trading day can be matched
+        ("2020-12-31", "2020-12-31"),
+    ],
+)
+def test_get_range_date(offline, interest_date, expected):
+    """Tests that the range is centered on the nearest trading day to the
+    date of interest, including the last day of the data.
+
+    Args:
+        offline: The fixture which stubs out Yahoo Finance.
+        interest_date: A string of the date of interest.
+        expected: A string of the trading day the range should center on."""
+    stock = sp.StockPlot("TSLA", "2020-01-01", "2021-01-01")
+    ranged = stock.get_range_date(interest_date, range_date=3)
+    prices = stock.get_stock_data()
+    middle = prices.index.get_loc(pd.Timestamp(expected))
+
+    assert ranged.equals(prices.iloc[max(middle - 3, 0) : middle + 4])
+
+    stacked = stock.get_range_dates([interest_date, "2030-01-01"], range_date=3)
+    assert list(stacked.index.get_level_values(0).unique()) == [interest_date]
+    assert stacked.values.tolist() == ranged.values.tolist()
+
+
+def test_price_store_top_up(offline):
+    """Tests that the price store only fetches the dates it doesn't have,
+    and serves stored dates without fetching at all.
+
+    Args:
+        offline: The fixture which stubs out Yahoo Finance."""
+    first = sp.StockPlot("TSLA", "2020-03-01", "2020-06-01")
+    assert offline == [("TSLA", "2020-03-01", "2020-06-01")]
+
+    sp.StockPlot("TSLA", "2020-04-01", "2020-05-01")
+    assert len(offline) == 1
+
+    wider = sp.StockPlot("TSLA", "2020-01-01", "2020-07-01")
+    assert offline[1:] == [
+        ("TSLA", "2020-01-01", "2020-03-01"),
+        ("TSLA", "2020-06-01", "2020-07-01"),
+    ]
+    assert list(wider.get_price_data().columns) == price_store.PRICE_COLUMNS
+    assert wider.get_stock_data()[first.get_stock_data().index].equals(
+        first.get_stock_data()
+    )
+    assert wider.get_stock_data().equals(
+        price_fetch("TSLA", "2020-01-01", "2020-07-01").Close
+    )
+
+
+def test_stock_universe(offline):
+    """Tests that a universe gives the same aligned data as building a
+    StockPlot for each ticker and concatenating them.
+
+    Args:
+        offline: The fixture which stubs out Yahoo Finance."""
+    tickers = ["TSLA", "^NDX", "^GSPC"]
+    universe = sp.StockUniverse(tickers, "2020-01-01", "2021-01-01")
+    stocks = [
+        sp.StockPlot(name, "2020-01-01", "2021-01-01") for name in tickers
+    ]
+    getters = ["get_stock_data", "get_normalized_data", "get_variance_data"]
+
+    assert universe.get_price_array().shape == (len(universe.get_dates()), 3)
+    for getter in getters:
+        expected = pd.concat(
+            [getattr(stock, getter)() for stock in stocks],
+            axis=1,
+            keys=tickers,
+        )
+        assert np.allclose(getattr(universe, getter)(), expected)
+
+
+def test_screen_drops(offline):
+    """Tests that the vectorized screen flags and ranks the same dates
+    as checking each row of the variance table one at a time.
+
+    Args:
+        offline: The fixture which stubs out Yahoo Finance."""
+    tickers = ["TSLA", "^NDX", "^GSPC"]
+    universe = sp.StockUniverse(tickers, "2014-01-01", "2023-01-01")
+    variance = universe.get_variance_data()
+    screened = universe.screen_drops("TSLA", drop=-0.5, benchmark_floor=-0.2)
+
+    expected = [
+        date
+        for date, row in variance.iterrows()
+        if round(row["TSLA"], 2) < -0.5
+        and all(round(row[name], 2) >= -0.2 for name in tickers[1:])
+    ]
+    expected.sort(key=lambda date: variance["TSLA"][date])
+
+    assert len(expected) > 0
+    assert list(screened.index) == expected
+    positions = variance.index.get_indexer(expected)
+    assert list(screened["previous_date"]) == list(
+        variance.index[positions - 1]
+    )
+    assert (
+        screened["year_count"]
+        == screened.groupby("year")["year"].transform("size")
+    ).all()
+
+
+def test_market_model(offline):
+    """Tests that the batched market model matches fitting a regression
+    for each event and ticker one at a time.
+
+    Args:
+        offline: The fixture which stubs out Yahoo Finance."""
+    tickers = ["TSLA", "DRIV", "^NDX"]
+    universe = sp.StockUniverse(tickers, "2020-01-01", "2021-01-01")
+    variance = universe.get_variance_data()
+    events = ["2020-06-06", "2020-09-15", "2020-01-10", "2020-12-30"]
+    table = universe.market_model(
+        ["TSLA", "DRIV"], "^NDX", events, estimation_window=60, gap=2
+    )
+
+    # the january and late december events don't fit in the data
+    assert list(table["event_date"].unique()) == list(
+        pd.to_datetime(events[:2])
+    )
+    assert len(table) == 2 * 2 * 6
+    for (event, ticker), rows in table.groupby(["event_date", "ticker"]):
+        day_0 = variance.index.searchsorted(event)
+        estimation = variance.iloc[day_0 - 62 : day_0 - 2]
+        beta, alpha = np.polyfit(estimation["^NDX"], estimation[ticker], 1)
+        window = variance.iloc[day_0 : day_0 + 6]
+        abnormal = window[ticker] - (alpha + beta * window["^NDX"])
+
+        assert np.allclose(rows["beta"], beta)
+        assert list(rows["date"]) == list(window.index)
+        assert np.allclose(rows["abnormal_return"], abnormal)
+        assert np.allclose(
+            rows["cumulative_abnormal_return"], abnormal.cumsum()
+        )
+        assert np.isfinite(rows["t_stat"]).all()
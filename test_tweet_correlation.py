@@ -0,0 +1,105 @@
+"""
+Tests for the tweet and stock correlation functions, checked against
+Pandas computing the same correlations one window or lag at a time.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from tweet_correlation import correlation_scan
+
+
+@pytest.fixture
+def daily_data():
+    """Made up daily tweet features and percent variances, where TSLA
+    follows the tweet count two days later.
+
+    Return:
+        A tuple of the features and variance Dataframes"""
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2020-01-01", periods=200)
+    features = pd.DataFrame(
+        {
+            "tweet_count": rng.poisson(5, 200).astype(float),
+            "likes_sum": rng.normal(1000, 100, 200),
+        },
+        dates,
+    )
+    variance = pd.DataFrame(
+        {
+            "TSLA": np.roll(features["tweet_count"], 2)
+            + rng.normal(0, 0.5, 200),
+            "^NDX": rng.normal(0, 1, 200),
+        },
+        dates,
+    )
+    variance.iloc[10, 1] = np.nan
+    # the tweets start a week after the prices
+    return features.iloc[5:], variance
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_correlation_scan(daily_data, processes):
+    """Tests the rolling and lagged correlations of every feature and
+    ticker pair.
+
+    Args:
+        daily_data: The fixture of made up features and variances.
+        processes: An integer number of worker processes."""
+    features, variance = daily_data
+    rolling, lagged = correlation_scan(
+        features, variance, window=30, max_lag=3, processes=processes
+    )
+    dates = features.index.intersection(variance.index)
+    assert list(rolling.index) == list(dates)
+    assert len(lagged) == 2 * 2 * 7
+
+    for feature in features:
+        for ticker in variance:
+            x = features.loc[dates, feature]
+            y = variance.loc[dates, ticker]
+            # missing days are skipped rather than blanking the window
+            expected = x.rolling(30, min_periods=3).corr(y)
+            assert rolling[(feature, ticker)].iloc[:29].isna().all()
+            assert np.allclose(
+                rolling[(feature, ticker)].iloc[29:], expected.iloc[29:]
+            )
+            for lag in range(-3, 4):
+                row = lagged[
+                    (lagged["feature"] == feature)
+                    & (lagged["ticker"] == ticker)
+                    & (lagged["lag"] == lag)
+                ]
+                assert np.isclose(
+                    row["correlation"].iloc[0], x.corr(y.shift(-lag))
+                )
+
+    # the tweet count leads TSLA by two days
+    tsla = lagged[
+        (lagged["feature"] == "tweet_count") & (lagged["ticker"] == "TSLA")
+    ]
+    assert tsla.loc[tsla["correlation"].idxmax(), "lag"] == 2
+
+
+def test_correlation_scale():
+    """Tests correlations of features and variances of very different
+    sizes, like summed likes against daily percent changes, and that a
+    constant feature has no correlation."""
+    rng = np.random.default_rng(1)
+    dates = pd.bdate_range("2021-01-01", periods=120)
+    likes = rng.lognormal(16.8, 0.5, 120)
+    features = pd.DataFrame(
+        {"likes_sum": likes, "constant": np.full(120, 2e7)}, dates
+    )
+    variance = pd.DataFrame(
+        {"TSLA": 1e-9 * likes + rng.normal(0, 0.01, 120)}, dates
+    )
+    rolling, lagged = correlation_scan(features, variance, window=30)
+
+    expected = features["likes_sum"].rolling(30).corr(variance["TSLA"])
+    assert np.allclose(
+        rolling[("likes_sum", "TSLA")].iloc[29:], expected.iloc[29:]
+    )
+    assert rolling[("constant", "TSLA")].isna().all()
+    by_feature = lagged.groupby("feature")["correlation"]
+    assert by_feature.count()["likes_sum"] == 11
+    assert by_feature.count()["constant"] == 0
@@ -0,0 +1,149 @@
+"""
+testing the inverted index of tweet text
+
+The index is checked on a small made up archive so the expected results
+can be written out by hand.
+"""
+from datetime import datetime
+import csv
+import json
+import os
+import pytest
+import tweet_index
+from tweet_index import load_tweet_index, search_tweets, tokenize
+
+HEADER = ["date and time", "content", "like count", "retweet count"]
+
+# newest first, the way the scraper writes archives
+ROWS = [
+    ["2018-08-08 10:00:00+00:00", "@jack Funding secured!", "5", "1"],
+    [
+        "2018-08-07 16:48:13+00:00",
+        "Taking Tesla private. Funding secured.",
+        "9",
+        "2",
+    ],
+    ["2018-08-01 12:00:00+00:00", "Secured the funding for Tesla", "3", "0"],
+    ["2018-07-01 12:00:00+00:00", "Tesla Model 3 production", "1", "0"],
+]
+
+
+def write_archive(rows):
+    """
+    Writes an archive of tweets to raw-data/test-all-tweets.csv.
+
+    Args:
+        rows (list): the csv rows to write below the header.
+    """
+    with open(
+        "raw-data/test-all-tweets.csv", "w", encoding="utf-8", newline=""
+    ) as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    """
+    Writes a small archive in a temporary folder and works from there.
+    """
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("raw-data")
+    write_archive(ROWS)
+    tweet_index._TWEET_INDEXES.clear()
+
+
+def test_tokenize():
+    """
+    Tests that tokens are lowercase words without punctuation.
+    """
+    assert tokenize("Am considering $TSLA at $420. Funding secured.") == [
+        "am",
+        "considering",
+        "tsla",
+        "at",
+        "420",
+        "funding",
+        "secured",
+    ]
+
+
+@pytest.mark.parametrize(
+    "query, options, expected",
+    [
+        # keywords match in any order
+        ("secured funding", {}, [0, 1, 2]),
+        # phrases match the words in order
+        ('"funding secured"', {}, [0, 1]),
+        ('"funding secured"', {"replies": False}, [1]),
+        # prefixes match every word starting with them
+        ("tes* fund*", {}, [1, 2]),
+        ("tesla", {"end": datetime(2018, 8, 1, 12)}, [3]),
+        ("tesla", {"start": datetime(2018, 8, 1, 12)}, [1]),
+        ("unknown", {}, []),
+    ],
+)
+def test_search_tweets(archive, query, options, expected):
+    """
+    Tests keyword, phrase and prefix queries with date and reply filters.
+
+    Args:
+        archive: the fixture of a made up archive.
+        query (str): the query to search for.
+        options (dict): the start, end and replies arguments.
+        expected (list): positions in ROWS of the expected tweets.
+    """
+    assert search_tweets("test", query, **options) == [
+        ROWS[i] for i in expected
+    ]
+
+
+def test_index_update(archive, monkeypatch):
+    """
+    Tests that tweets added to the top of the archive are indexed without
+    rebuilding the saved index.
+
+    Args:
+        archive: the fixture of a made up archive.
+        monkeypatch: the pytest fixture for patching attributes.
+    """
+    load_tweet_index("test")
+    newer = ["2018-08-09 10:00:00+00:00", "Funding secured again", "1", "1"]
+    write_archive([newer] + ROWS)
+    tweet_index._TWEET_INDEXES.clear()
+
+    built = []
+    monkeypatch.setattr(
+        tweet_index.TweetIndex, "from_rows", built.append, raising=True
+    )
+    assert search_tweets("test", '"funding secured"') == [newer] + ROWS[:2]
+    assert not built
+    assert len(load_tweet_index("test")) == len(ROWS) + 1
+
+
+def test_index_rewritten(archive, monkeypatch):
+    """
+    Tests that an archive rewritten without new tweets only refreshes the
+    saved index's meta, rather than saving the mapped arrays over
+    themselves.
+
+    Args:
+        archive: the fixture of a made up archive.
+        monkeypatch: the pytest fixture for patching attributes.
+    """
+    load_tweet_index("test")
+    built = []
+    monkeypatch.setattr(
+        tweet_index.TweetIndex, "from_rows", built.append, raising=True
+    )
+    for mtime in (1, 2):
+        write_archive(ROWS)
+        os.utime("raw-data/test-all-tweets.csv", ns=(mtime, mtime))
+        tweet_index._TWEET_INDEXES.clear()
+        assert search_tweets("test", "tesla") == ROWS[1:]
+        with open(
+            "raw-data/test-all-tweets.index/meta.json", "r", encoding="utf-8"
+        ) as file:
+            assert json.load(file)["source_mtime_ns"] == mtime
+    assert not built
@@ -0,0 +1,45 @@
+"""
+testing the lexicon scores of tweets
+"""
+import numpy as np
+import pandas as pd
+from csv_process import daily_tweet_features
+from tweet_scores import score_contents, score_tweets
+
+
+def test_score_contents():
+    """
+    Tests each score against words counted by hand.
+    """
+    scores = score_contents(
+        [
+            "Am considering taking Tesla private at $420. Funding secured.",
+            "WOW this is GREAT, great!",
+            "Short sellers are a scam. Damn.",
+            "",
+        ]
+    )
+    assert list(scores["sentiment"]) == [0, 3, -1, 0]
+    assert list(scores["company_mentions"]) == [1, 0, 0, 0]
+    assert list(scores["volatility_cues"]) == [4, 0, 1, 0]
+    assert list(scores["profanity"]) == [0, 0, 1, 0]
+    assert list(scores["token_count"]) == [9, 5, 6, 0]
+    assert np.allclose(scores["caps_ratio"], [0, 0.4, 0, 0])
+
+
+def test_daily_scores():
+    """
+    Tests that tweet scores are added up per trading day.
+    """
+    header = ["date and time", "content", "like count", "retweet count"]
+    rows = [
+        header,
+        ["2021-03-08 15:00:00+00:00", "great great", "1", "1"],
+        ["2021-03-05 15:00:00+00:00", "love tesla", "1", "1"],
+        ["2021-03-05 16:00:00+00:00", "terrible", "1", "1"],
+    ]
+    days = pd.to_datetime(["2021-03-05", "2021-03-08"])
+    features = daily_tweet_features(rows, days, scores=score_tweets(rows))
+
+    assert list(features["sentiment_sum"]) == [0, 2]
+    assert list(features["company_mentions_mean"]) == [0.5, 0]
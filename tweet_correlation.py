@@ -0,0 +1,188 @@
+"""Functions that measure how daily tweet activity lines up with stock moves"""
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+
+def _moments(x, y):
+    """Gets the running sums needed for correlations, leaving out the days
+    either value is missing
+
+    Args:
+        x: A 2-D numpy array with a column for each feature.
+        y: A 1-D numpy array of the values to correlate against.
+
+    Return:
+        A tuple of 2-D numpy arrays of the number of valid days and the
+        sums of x, y, x squared, y squared and x times y, each with a
+        leading row of zeros so a window's sum is a difference of two rows"""
+    y = np.broadcast_to(y[:, None], x.shape)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x = np.where(valid, x, 0)
+    y = np.where(valid, y, 0)
+    sums = [valid, x, y, x * x, y * y, x * y]
+    return tuple(
+        np.concatenate([np.zeros((1, x.shape[1])), np.cumsum(s, axis=0)])
+        for s in sums
+    )
+
+
+def _correlation(count, sx, sy, sxx, syy, sxy):
+    """Computes Pearson correlations from sums
+
+    Args:
+        count: A numpy array of the number of valid days.
+        sx, sy: Numpy arrays of the sums of x and y.
+        sxx, syy: Numpy arrays of the sums of x and y squared.
+        sxy: A numpy array of the sums of x times y.
+
+    Return:
+        A numpy array of correlations, NaN where either side is constant or
+        there are fewer than 3 days"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sxy - sx * sy / count
+        var_x = sxx - sx * sx / count
+        var_y = syy - sy * sy / count
+        corr = cov / np.sqrt(var_x * var_y)
+    # rounding in the running sums can leave a constant window slightly off
+    # 0, by an amount relative to that side's own sum of squares
+    flat = (
+        (var_x <= 1e-12 * np.abs(sxx))
+        | (var_y <= 1e-12 * np.abs(syy))
+        | (count < 3)
+    )
+    return np.where(flat, np.nan, np.clip(corr, -1, 1))
+
+
+def rolling_correlation(x, y, window):
+    """Calculates the correlation of each feature with y over a rolling
+    window of days, from running sums instead of recomputing each window
+
+    Args:
+        x: A 2-D numpy array with a column for each feature.
+        y: A 1-D numpy array of the values to correlate against.
+        window: An integer number of days in each window.
+
+    Return:
+        A 2-D numpy array with the correlation of the window ending on
+        each day. The first window - 1 days are NaN"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    sums = _moments(x, y)
+    rolled = [total[window:] - total[:-window] for total in sums]
+    corr = np.full(x.shape, np.nan)
+    if len(x) >= window:
+        corr[window - 1 :] = _correlation(*rolled)
+    return corr
+
+
+def lagged_correlation(x, y, max_lag):
+    """Calculates the correlation of each feature with y shifted by every
+    lag from -max_lag to max_lag days
+
+    A positive lag compares a day's tweets with the stock that many trading
+    days later, so correlations at positive lags are where tweets could
+    lead the stock.
+
+    Args:
+        x: A 2-D numpy array with a column for each feature.
+        y: A 1-D numpy array of the values to correlate against.
+        max_lag: An integer number of days to shift y each way.
+
+    Return:
+        A tuple of 2-D numpy arrays with a row for each lag, of the
+        correlations and of the number of days compared"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    length = len(y)
+    corrs, counts = [], []
+    for lag in range(-max_lag, max_lag + 1):
+        if lag >= 0:
+            pair = (x[: length - lag], y[lag:])
+        else:
+            pair = (x[-lag:], y[: length + lag])
+        sums = [total[-1] for total in _moments(*pair)]
+        corrs.append(_correlation(*sums))
+        counts.append(sums[0])
+    return np.array(corrs), np.array(counts, dtype=np.int64)
+
+
+def _scan_ticker(x, y, window, max_lag):
+    """Runs both correlations for one ticker. This runs in a worker process
+
+    Return:
+        A tuple of the rolling correlations, lagged correlations and lagged
+        day counts"""
+    return (
+        rolling_correlation(x, y, window),
+        *lagged_correlation(x, y, max_lag),
+    )
+
+
+def correlation_scan(features, variance, window=60, max_lag=5, processes=1):
+    """Measures how every tweet feature correlates with every ticker's
+    percent variance, over rolling windows and at lags around each day
+
+    Args:
+        features: A Pandas Dataframe of daily tweet features indexed by
+        date, like csv_process.daily_tweet_features.
+        variance: A Pandas Series from StockPlot.get_variance_data(), or a
+        Pandas Dataframe with a column for each ticker like
+        StockUniverse.get_variance_data().
+        window: An integer number of trading days in each rolling window.
+        max_lag: An integer number of trading days to shift the variance
+        each way.
+        processes: An integer number of worker processes to spread the
+        tickers across. 1 runs every ticker in this process and None uses
+        one per core.
+
+    Return:
+        A tuple of two Pandas Dataframes. The first is indexed by the
+        dates both inputs share, with a (feature, ticker) column of rolling
+        correlations. The second has a row for each feature, ticker and lag
+        with the correlation and the number of days compared"""
+    if isinstance(variance, pd.Series):
+        variance = variance.to_frame(variance.name or "variance")
+    dates = features.index.intersection(variance.index)
+    x = features.loc[dates].to_numpy(dtype=np.float64)
+    ys = [
+        variance.loc[dates, ticker].to_numpy(np.float64) for ticker in variance
+    ]
+    tickers = list(variance.columns)
+    jobs = [(x, y, window, max_lag) for y in ys]
+
+    if processes == 1 or len(jobs) <= 1:
+        results = [_scan_ticker(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(_scan_ticker, *zip(*jobs)))
+
+    rolling = pd.concat(
+        [
+            pd.DataFrame(result[0], dates, features.columns)
+            for result in results
+        ],
+        axis=1,
+        keys=tickers,
+    ).swaplevel(axis=1)
+    rolling = rolling[pd.MultiIndex.from_product([features.columns, tickers])]
+    rolling.columns.names = ["feature", "ticker"]
+
+    lags = np.arange(-max_lag, max_lag + 1)
+    lagged = pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "feature": np.tile(features.columns, len(lags)),
+                    "ticker": ticker,
+                    "lag": np.repeat(lags, len(features.columns)),
+                    "correlation": result[1].ravel(),
+                    "days": result[2].ravel(),
+                }
+            )
+            for ticker, result in zip(tickers, results)
+        ],
+        ignore_index=True,
+    )
+    lagged = lagged.sort_values(["feature", "ticker", "lag"], kind="stable")
+    return rolling, lagged.reset_index(drop=True)
@@ -0,0 +1,468 @@
+"""
+An inverted index over the text of scraped tweets for keyword searches.
+"""
+from bisect import bisect_left
+import json
+import os
+import re
+import sys
+import numpy as np
+import pandas as pd
+from csv_process import (
+    DATE_FORMAT,
+    load_tweet_store,
+    replace_folder,
+    source_signature,
+)
+
+# bump whenever the layout of the saved indexes changes
+_INDEX_VERSION = 1
+
+# indexes that have already been loaded, keyed by twitter handle
+_TWEET_INDEXES = {}
+
+# a token is a run of letters, digits and underscores, so "$TSLA" is "tsla"
+TOKEN = re.compile(r"\w+")
+
+# a query term is a quoted phrase or a word, optionally ending in *
+_QUERY_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def tokenize(text):
+    """
+    Splits tweet text into lowercase tokens.
+
+    Args:
+        text (str): text of a tweet or query.
+
+    Returns:
+        tokens (list): the tokens in the order they appear.
+    """
+    return TOKEN.findall(text.lower())
+
+
+def _sort_postings(token_ids, docs, vocab_size):
+    """
+    Sorts (token, doc) pairs into posting lists.
+
+    Args:
+        token_ids (np.ndarray): the token id of each pair.
+        docs (np.ndarray): the doc id of each pair.
+        vocab_size (int): number of tokens in the vocabulary.
+
+    Returns:
+        postings (tuple): the doc ids sorted by token and then doc, and the
+        offsets of each token's posting list in them.
+    """
+    order = np.lexsort((docs, token_ids))
+    offsets = np.zeros(vocab_size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(token_ids, minlength=vocab_size), out=offsets[1:])
+    return docs[order].astype(np.int64), offsets
+
+
+class TweetIndex:
+    """
+    Posting lists of the tweets each token appears in.
+
+    Tweets are numbered from the bottom of the csv upwards, so the ids of
+    indexed tweets stay the same when the scraper adds newer tweets to the
+    top of the csv.
+
+    Attributes:
+        _tokens: a sorted list of every token in the tweets.
+        _postings: a numpy int64 array of doc ids, sorted by token and then
+        by doc id.
+        _offsets: a numpy int64 array where token i's posting list is
+        _postings[_offsets[i]:_offsets[i + 1]].
+        _timestamps: a numpy datetime64 array of each doc's time in UTC.
+        _is_reply: a numpy bool array which is True for replies.
+        _rows: a sequence of the raw csv rows (lists of strings) in csv
+        order, used to check phrases and return results.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, tokens, postings, offsets, timestamps, is_reply, rows):
+        self._tokens = list(tokens)
+        self._postings = postings
+        self._offsets = offsets
+        self._timestamps = timestamps
+        self._is_reply = is_reply
+        self._rows = rows
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Builds an index of csv rows.
+
+        Args:
+            rows (list): the csv rows without the header, in csv order.
+
+        Returns:
+            index (TweetIndex): an index of every row.
+        """
+        index = cls(
+            [],
+            np.zeros(0, dtype=np.int64),
+            np.zeros(1, dtype=np.int64),
+            np.zeros(0, dtype="datetime64[ns]"),
+            np.zeros(0, dtype=bool),
+            [],
+        )
+        index.add(rows)
+        return index
+
+    @classmethod
+    def load(cls, folder, rows):
+        """
+        Loads an index saved with save, memory-mapping its arrays.
+
+        Args:
+            folder (str): path of the folder the index was saved to.
+            rows (list): the csv rows the index was built from.
+
+        Returns:
+            index (TweetIndex): the saved index.
+        """
+
+        def column(name):
+            return np.load(os.path.join(folder, f"{name}.npy"), mmap_mode="r")
+
+        with open(
+            os.path.join(folder, "tokens.json"), "r", encoding="utf-8"
+        ) as file:
+            tokens = json.load(file)
+        return cls(
+            tokens,
+            column("postings"),
+            column("offsets"),
+            column("timestamps").view("datetime64[ns]"),
+            column("is_reply"),
+            rows,
+        )
+
+    def save(self, folder, meta=None):
+        """
+        Saves the index as a folder of numpy arrays that load can map.
+
+        Args:
+            folder (str): path of the folder to save the index to.
+            meta (dict): extra values to record in the folder's meta.json.
+        """
+        # the arrays may be mapped from the folder, so it isn't overwritten
+        with replace_folder(folder) as temp:
+            with open(
+                os.path.join(temp, "tokens.json"), "w", encoding="utf-8"
+            ) as file:
+                json.dump(self._tokens, file)
+            for name, values in (
+                ("postings", self._postings),
+                ("offsets", self._offsets),
+                ("timestamps", self._timestamps.view(np.int64)),
+                ("is_reply", self._is_reply),
+            ):
+                np.save(os.path.join(temp, f"{name}.npy"), values)
+            _write_meta(temp, self.get_meta(meta))
+
+    def get_meta(self, meta=None):
+        """
+        Makes the meta.json values describing the index.
+
+        Args:
+            meta (dict): extra values to record, or None.
+
+        Returns:
+            meta (dict): the values, with the number of rows indexed and the
+            top row, used to tell if rows were added to the csv since.
+        """
+        meta = dict(meta or {}, rows=len(self), version=_INDEX_VERSION)
+        if len(self):
+            meta["top_row"] = list(self._rows[0])
+        return meta
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    def add(self, rows):
+        """
+        Adds the tweets newly written to the top of the csv.
+
+        Only the new tweets are tokenized. Their postings are merged into
+        the existing posting lists.
+
+        Args:
+            rows (list): every csv row without the header, in csv order,
+            where the rows after the first len(rows) - len(self) are the
+            ones already indexed.
+        """
+        # the bottom new row gets the next id after the indexed tweets
+        new_rows = [rows[i] for i in reversed(range(len(rows) - len(self)))]
+        if not new_rows:
+            self._rows = rows
+            return
+        columns = list(zip(*new_rows))
+        first_doc = len(self)
+
+        contents = pd.Series(columns[1], dtype=object).astype(str)
+        pairs = pd.DataFrame(
+            {"token": contents.str.lower().str.findall(TOKEN.pattern)}
+        )
+        pairs["doc"] = np.arange(first_doc, first_doc + len(new_rows))
+        pairs = pairs.explode("token").dropna().drop_duplicates()
+
+        # merge the old and new postings under one sorted vocabulary
+        old_tokens = np.array(self._tokens, dtype=object)
+        tokens = np.array(
+            sorted(set(self._tokens).union(pairs["token"])), dtype=object
+        )
+        lengths = np.diff(self._offsets)
+        old_ids = np.repeat(
+            np.searchsorted(tokens, old_tokens).astype(np.int64), lengths
+        )
+        new_ids = np.searchsorted(tokens, pairs["token"].to_numpy(object))
+        self._postings, self._offsets = _sort_postings(
+            np.concatenate([old_ids, new_ids]),
+            np.concatenate(
+                [np.asarray(self._postings), pairs["doc"].to_numpy(np.int64)]
+            ),
+            len(tokens),
+        )
+        self._tokens = list(tokens)
+
+        timestamps = pd.to_datetime(
+            pd.Series(columns[0], dtype=object), format=DATE_FORMAT, utc=True
+        )
+        timestamps = (
+            timestamps.dt.tz_localize(None).to_numpy().astype("datetime64[ns]")
+        )
+        self._timestamps = np.concatenate([self._timestamps, timestamps])
+        self._is_reply = np.concatenate(
+            [self._is_reply, contents.str.startswith("@").to_numpy(bool)]
+        )
+        self._rows = rows
+
+    def _posting(self, token):
+        """
+        Gets the sorted doc ids of the tweets containing a token.
+
+        Args:
+            token (str): a lowercase token.
+
+        Returns:
+            docs (np.ndarray): the doc ids, empty if the token is unknown.
+        """
+        i = bisect_left(self._tokens, token)
+        if i == len(self._tokens) or self._tokens[i] != token:
+            return np.zeros(0, dtype=np.int64)
+        return np.asarray(
+            self._postings[self._offsets[i] : self._offsets[i + 1]]
+        )
+
+    def _prefix_posting(self, prefix):
+        """
+        Gets the sorted doc ids of the tweets with a token starting with a
+        prefix.
+
+        Args:
+            prefix (str): a lowercase prefix.
+
+        Returns:
+            docs (np.ndarray): the doc ids.
+        """
+        # the tokens with the prefix are one sorted run of the vocabulary
+        low = bisect_left(self._tokens, prefix)
+        high = bisect_left(self._tokens, prefix + chr(sys.maxunicode), low)
+        postings = self._postings[self._offsets[low] : self._offsets[high]]
+        return np.unique(postings)
+
+    def _phrase_posting(self, phrase):
+        """
+        Gets the sorted doc ids of the tweets containing a phrase.
+
+        The posting lists of the phrase's tokens are intersected first, so
+        only tweets with every token are checked for the words in order.
+
+        Args:
+            phrase (list): lowercase tokens of the phrase.
+
+        Returns:
+            docs (np.ndarray): the doc ids.
+        """
+        docs = _intersect([self._posting(token) for token in phrase])
+        if len(phrase) < 2:
+            return docs
+        length = len(phrase)
+        found = []
+        for doc in docs:
+            tokens = tokenize(self.get_row(doc)[1])
+            if any(
+                tokens[i : i + length] == phrase
+                for i in range(len(tokens) - length + 1)
+            ):
+                found.append(doc)
+        return np.array(found, dtype=np.int64)
+
+    def get_row(self, doc):
+        """
+        Gets the raw csv row of an indexed tweet.
+
+        Args:
+            doc (int): the tweet's doc id.
+
+        Returns:
+            row (list): the tweet's row as it appears in the csv.
+        """
+        return self._rows[len(self._rows) - 1 - doc]
+
+    def search(self, query, start=None, end=None, replies=True):
+        """
+        Finds the tweets matching every term of a query.
+
+        A term is a word, a word ending in * to match any word starting with
+        it, or a phrase in double quotes. Case and punctuation are ignored.
+
+        Args:
+            query (str): the query, such as '"funding secured" tes*'.
+            start (datetime): exclusive lower bound on tweet time in UTC, or
+            None.
+            end (datetime): exclusive upper bound on tweet time in UTC, or
+            None.
+            replies (bool): whether to include replies.
+
+        Returns:
+            docs (np.ndarray): the sorted doc ids of the matching tweets.
+        """
+        postings = []
+        for phrase, word in _QUERY_TERM.findall(query):
+            if phrase:
+                postings.append(self._phrase_posting(tokenize(phrase)))
+            elif word.endswith("*") and tokenize(word):
+                postings.append(self._prefix_posting(tokenize(word)[0]))
+            else:
+                postings.append(self._phrase_posting(tokenize(word)))
+        if not postings:
+            return np.zeros(0, dtype=np.int64)
+        docs = _intersect(postings)
+
+        keep = np.ones(len(docs), dtype=bool)
+        times = self._timestamps[docs]
+        if start is not None:
+            keep &= times > np.datetime64(start, "ns")
+        if end is not None:
+            keep &= times < np.datetime64(end, "ns")
+        if not replies:
+            keep &= ~self._is_reply[docs]
+        return docs[keep]
+
+
+def _intersect(postings):
+    """
+    Intersects sorted posting lists, smallest first.
+
+    Args:
+        postings (list): numpy arrays of sorted doc ids.
+
+    Returns:
+        docs (np.ndarray): the doc ids in every list.
+    """
+    if not postings:
+        return np.zeros(0, dtype=np.int64)
+    postings = sorted(postings, key=len)
+    docs = postings[0]
+    for other in postings[1:]:
+        if len(docs) == 0:
+            break
+        docs = np.intersect1d(docs, other, assume_unique=True)
+    return docs
+
+
+def _write_meta(folder, meta):
+    """
+    Writes the meta.json of a saved index, replacing the old one at once.
+
+    Args:
+        folder (str): path of the saved index.
+        meta (dict): the values to write.
+    """
+    path = os.path.join(folder, "meta.json")
+    with open(f"{path}.new", "w", encoding="utf-8") as file:
+        json.dump(meta, file)
+    os.replace(f"{path}.new", path)
+
+
+def load_tweet_index(name, use_cache=True):
+    """
+    Loads the index of a user's tweets, building or updating it as needed.
+
+    The index is saved in a folder next to the user's raw csv. When the
+    scraper has only added tweets to the top of the csv, just those tweets
+    are indexed. Any other change to the csv rebuilds the index.
+
+    Args:
+        name (str): the name of the user's data to index.
+        use_cache (bool): whether to read and write the saved index.
+
+    Returns:
+        index (TweetIndex): the index of every tweet in the user's csv.
+    """
+    path = f"raw-data/{name}-all-tweets.csv"
+    signature = source_signature(path)
+    cached = _TWEET_INDEXES.get(name)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    rows = load_tweet_store(name, use_cache).get_rows()
+    folder = f"raw-data/{name}-all-tweets.index"
+    meta = None
+    if use_cache:
+        try:
+            with open(
+                os.path.join(folder, "meta.json"), "r", encoding="utf-8"
+            ) as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            meta = None
+
+    index = None
+    if meta is not None and meta.get("version") == _INDEX_VERSION:
+        indexed = meta["rows"]
+        if meta.get("source_mtime_ns") == signature[
+            "source_mtime_ns"
+        ] and indexed == len(rows):
+            index = TweetIndex.load(folder, rows)
+        elif 0 < indexed <= len(rows) and (
+            list(rows[len(rows) - indexed]) == meta.get("top_row")
+        ):
+            index = TweetIndex.load(folder, rows)
+            if indexed < len(rows):
+                index.add(rows)
+                index.save(folder, signature)
+            else:
+                # the csv was rewritten without new tweets, which only
+                # changes its signature
+                _write_meta(folder, index.get_meta(signature))
+    if index is None:
+        index = TweetIndex.from_rows(rows)
+        if use_cache:
+            index.save(folder, signature)
+
+    _TWEET_INDEXES[name] = (signature, index)
+    return index
+
+
+def search_tweets(name, query, start=None, end=None, replies=True):
+    """
+    Finds a user's tweets matching a query, see TweetIndex.search.
+
+    Args:
+        name (str): the name of the user's data to search.
+        query (str): the query, such as '"funding secured"'.
+        start (datetime): exclusive lower bound on tweet time in UTC, or None.
+        end (datetime): exclusive upper bound on tweet time in UTC, or None.
+        replies (bool): whether to include replies.
+
+    Returns:
+        rows (list): the csv rows of the matching tweets in csv order.
+    """
+    index = load_tweet_index(name)
+    docs = index.search(query, start, end, replies)
+    return [index.get_row(doc) for doc in docs[::-1]]
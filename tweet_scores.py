@@ -0,0 +1,271 @@
+"""
+Functions that score the text of scraped tweets against word lists.
+"""
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from csv_process import (
+    CACHE_DIR,
+    as_store,
+    load_tweet_store,
+    read_cache_meta,
+    source_signature,
+)
+from tweet_index import TOKEN
+
+# words and their weights for each score. Tokens are lowercase words
+# without punctuation, as tweet_index.tokenize splits them
+LEXICONS = {
+    "sentiment": {
+        **dict.fromkeys(
+            [
+                "amazing",
+                "awesome",
+                "beautiful",
+                "best",
+                "congrats",
+                "congratulations",
+                "cool",
+                "epic",
+                "excellent",
+                "exciting",
+                "fun",
+                "glad",
+                "good",
+                "great",
+                "happy",
+                "incredible",
+                "love",
+                "nice",
+                "proud",
+                "record",
+                "strong",
+                "success",
+                "thanks",
+                "thank",
+                "win",
+                "wow",
+            ],
+            1.0,
+        ),
+        **dict.fromkeys(
+            [
+                "awful",
+                "bad",
+                "broken",
+                "crash",
+                "dead",
+                "fail",
+                "failure",
+                "fake",
+                "fraud",
+                "hate",
+                "lose",
+                "loss",
+                "lost",
+                "problem",
+                "problems",
+                "sad",
+                "scam",
+                "sorry",
+                "terrible",
+                "tragic",
+                "unfortunately",
+                "worse",
+                "worst",
+                "wrong",
+            ],
+            -1.0,
+        ),
+    },
+    "company_mentions": dict.fromkeys(
+        [
+            "tesla",
+            "tsla",
+            "spacex",
+            "twitter",
+            "twtr",
+            "neuralink",
+            "boring",
+            "starlink",
+            "starship",
+            "cybertruck",
+            "solarcity",
+            "doge",
+            "dogecoin",
+            "bitcoin",
+            "btc",
+        ],
+        1.0,
+    ),
+    "volatility_cues": dict.fromkeys(
+        [
+            "420",
+            "bankrupt",
+            "bankruptcy",
+            "buy",
+            "delay",
+            "delayed",
+            "funding",
+            "halt",
+            "lawsuit",
+            "overvalued",
+            "price",
+            "private",
+            "recall",
+            "sec",
+            "secured",
+            "sell",
+            "selling",
+            "short",
+            "shorts",
+            "sold",
+            "stock",
+            "taxes",
+        ],
+        1.0,
+    ),
+    "profanity": dict.fromkeys(
+        [
+            "ass",
+            "bs",
+            "crap",
+            "damn",
+            "fuck",
+            "fucking",
+            "hell",
+            "shit",
+            "wtf",
+        ],
+        1.0,
+    ),
+}
+
+# a word of two or more letters written in capitals
+_CAPS_WORD = r"\b[A-Z][A-Z]+\b"
+_WORD = r"\b[A-Za-z][A-Za-z]+\b"
+
+
+def _lexicon_version():
+    """
+    Gets a hash of the lexicons, so cached scores are redone when they change.
+
+    Returns:
+        version (str): hex digest of the lexicons.
+    """
+    text = json.dumps(LEXICONS, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(text).hexdigest()
+
+
+def document_term_matrix(contents):
+    """
+    Tokenizes every tweet at once into a sparse matrix of token counts.
+
+    Args:
+        contents (pd.Series): the text of each tweet.
+
+    Returns:
+        matrix (tuple): a scipy csr matrix with a row for each tweet and a
+        column for each token, and an array of the tokens.
+    """
+    tokens = contents.str.lower().str.findall(TOKEN.pattern)
+    lengths = tokens.str.len().to_numpy(dtype=np.int64)
+    flat = tokens.explode().dropna().to_numpy(dtype=object)
+    token_ids, vocab = pd.factorize(flat)
+    docs = np.repeat(np.arange(len(contents)), lengths)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(flat)), (docs, token_ids)),
+        shape=(len(contents), len(vocab)),
+    )
+    return matrix, np.asarray(vocab, dtype=object)
+
+
+def score_contents(contents):
+    """
+    Scores the text of many tweets against every lexicon.
+
+    Args:
+        contents (pd.Series or list): the text of each tweet.
+
+    Returns:
+        scores (pd.dataframe): dataframe with a row for each tweet and a
+        column for each lexicon holding the summed weights of its words,
+        plus the token count and the share of words written in capitals.
+    """
+    contents = pd.Series(contents, dtype=object).astype(str)
+    matrix, vocab = document_term_matrix(contents)
+    weights = np.array(
+        [
+            pd.Series(vocab).map(lexicon).fillna(0).to_numpy(np.float64)
+            for lexicon in LEXICONS.values()
+        ]
+    ).reshape(len(LEXICONS), len(vocab))
+
+    scores = pd.DataFrame(matrix @ weights.T, columns=list(LEXICONS))
+    scores["token_count"] = np.asarray(matrix.sum(axis=1)).ravel()
+    words = contents.str.count(_WORD).to_numpy(np.float64)
+    caps = contents.str.count(_CAPS_WORD).to_numpy(np.float64)
+    scores["caps_ratio"] = caps / np.maximum(words, 1)
+    return scores
+
+
+def score_tweets(tweets):
+    """
+    Scores every tweet in a tweet store.
+
+    Args:
+        tweets (list or TweetStore): tweets as returned by read_to_variable.
+
+    Returns:
+        scores (pd.dataframe): the scores of score_contents, in the store's
+        timestamp order, so they can be passed to daily_tweet_features.
+    """
+    store = as_store(tweets)
+    return score_contents([store.get_row(i)[1] for i in range(len(store))])
+
+
+def load_tweet_scores(name, use_cache=True):
+    """
+    Loads the scores of a user's tweets, scoring them on first use.
+
+    The scores are saved in the cache folder until the raw csv or the
+    lexicons change.
+
+    Args:
+        name (str): the name of the user's data to score.
+        use_cache (bool): whether to read and write the on-disk cache.
+
+    Returns:
+        scores (pd.dataframe): the scores of every tweet, in the timestamp
+        order of load_tweet_store.
+    """
+    signature = dict(
+        source_signature(f"raw-data/{name}-all-tweets.csv"),
+        lexicons=_lexicon_version(),
+    )
+    folder = os.path.join(CACHE_DIR, "scores", f"{name}-all-tweets")
+    meta = read_cache_meta(folder) if use_cache else None
+    if meta is not None and all(
+        meta.get(key) == value for key, value in signature.items()
+    ):
+        return pd.DataFrame(
+            np.load(os.path.join(folder, "scores.npy")),
+            columns=meta["columns"],
+        )
+
+    scores = score_tweets(load_tweet_store(name, use_cache))
+    if use_cache:
+        os.makedirs(folder, exist_ok=True)
+        meta_path = os.path.join(folder, "meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        np.save(
+            os.path.join(folder, "scores.npy"),
+            scores.to_numpy(dtype=np.float64),
+        )
+        with open(meta_path, "w", encoding="utf-8") as file:
+            json.dump(dict(signature, columns=list(scores.columns)), file)
+    return scores
@@ -3,8 +3,203 @@ Functions testing snscrape functionality
 """
 
 # import twitter scraping library and pandas
-import pandas as pd
-import snscrape.modules.twitter as sntwitter
+from contextlib import ExitStack
+import csv
+from datetime import datetime, timedelta, timezone
+import os
+import time
+import instrument
+
+# pandas and snscrape are imported by the functions that need them, so the
+# archive helpers can be used without loading the scraper
+
+# columns of the raw csvs holding every tweet of a user
+ALL_TWEETS_COLUMNS = ["date and time", "content", "like count", "retweet count"]
+
+# number of tweets snscrape gets from twitter with each timeline request
+PAGE_SIZE = 20
+
+
+def _user_items(twitter_handle):
+    """
+    Gets the tweets on a user's timeline, newest first.
+
+    Args:
+        twitter_handle (str) : Handle of the account to grab tweets from.
+
+    Returns:
+        items (iterator) : iterator of snscrape tweet objects.
+    """
+    # pylint: disable=import-outside-toplevel
+    import snscrape.modules.twitter as sntwitter
+
+    return sntwitter.TwitterUserScraper(twitter_handle).get_items()
+
+
+def _search_items(query):
+    """
+    Gets the tweets matching a twitter search query, newest first.
+
+    Args:
+        query (str) : twitter search query, such as
+        "from:jack until:2020-01-01".
+
+    Returns:
+        items (iterator) : iterator of snscrape tweet objects.
+    """
+    # pylint: disable=import-outside-toplevel
+    import snscrape.modules.twitter as sntwitter
+
+    return sntwitter.TwitterSearchScraper(query).get_items()
+
+
+class TweetWriter:
+    """
+    Writes scraped tweets to a csv in batches while the scrape runs.
+
+    Rows are buffered and appended to the csv every flush_every rows or
+    flush_seconds seconds, so memory use stays bounded, a crash only loses
+    the last batch, and other processes can read the csv during a crawl.
+
+    Attributes:
+        _path: path of the csv being written.
+        _file: the open csv file.
+        _writer: csv writer for _file.
+        _buffer: list of the rows not yet written.
+        _flush_every: number of buffered rows that triggers a flush.
+        _flush_seconds: seconds since the last flush that trigger a flush.
+        _flushed_at: time.monotonic() value of the last flush.
+        _count: number of rows written so far, including buffered ones.
+    """
+
+    def __init__(
+        self, path, columns, append=False, flush_every=100, flush_seconds=5.0
+    ):
+        exists = append and os.path.exists(path)
+        self._path = path
+        # pylint: disable=consider-using-with
+        self._file = open(
+            path, "a" if append else "w", encoding="utf-8", newline=""
+        )
+        # write plain newlines, as appended and prepended rows are copied
+        # between csvs line by line
+        self._writer = csv.writer(self._file, lineterminator="\n")
+        if not exists:
+            self._writer.writerow(columns)
+            self._file.flush()
+        self._buffer = []
+        self._flush_every = flush_every
+        self._flush_seconds = flush_seconds
+        self._flushed_at = time.monotonic()
+        self._count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_count(self):
+        """A getter method for the number of rows written so far."""
+        return self._count
+
+    def write(self, row):
+        """
+        Adds a row to the csv, flushing the batch if it is due.
+
+        Args:
+            row (list) : values of the row, in column order.
+        """
+        self._buffer.append(row)
+        self._count += 1
+        if (
+            len(self._buffer) >= self._flush_every
+            or time.monotonic() - self._flushed_at >= self._flush_seconds
+        ):
+            self.flush()
+
+    def flush(self):
+        """
+        Appends the buffered rows to the csv and flushes them to disk.
+        """
+        self._writer.writerows(self._buffer)
+        self._buffer = []
+        self._file.flush()
+        self._flushed_at = time.monotonic()
+
+    def close(self):
+        """
+        Flushes the buffered rows and closes the csv.
+        """
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+def _read_tweets(path):
+    """
+    Reads a csv written by a scraper back into a dataframe.
+
+    Args:
+        path (str) : path of the csv.
+
+    Returns:
+        tweets_df (pd.dataframe) : Pandas dataframe of the tweets in the csv,
+        with the dates parsed back into datetimes.
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    tweets_df = pd.read_csv(path, dtype={"content": str})
+    tweets_df["date and time"] = pd.to_datetime(tweets_df["date and time"])
+    return tweets_df
+
+
+def _to_utc(date):
+    """
+    Converts a date bound to a timezone aware datetime in UTC.
+
+    Args:
+        date (str or datetime) : date in the format yyyy-mm-dd, or a datetime.
+        Naive datetimes are taken to be in UTC.
+
+    Returns:
+        date (datetime) : the date in UTC.
+    """
+    if isinstance(date, str):
+        date = datetime.fromisoformat(date)
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.astimezone(timezone.utc)
+
+
+def _between(items, since=None, until=None, patience=2):
+    """
+    Keeps the tweets from a newest first timeline within a date range.
+
+    Args:
+        items (iterator) : snscrape tweets, newest first.
+        since (str or datetime) : earliest time to keep, or None.
+        until (str or datetime) : time to keep tweets before, or None.
+        patience (int) : number of tweets in a row older than since to read
+        before stopping, so that a pinned tweet doesn't stop the crawl.
+
+    Yields:
+        tweet (snscrape tweet) : each tweet within the range. Iteration stops
+        once the timeline has passed since, so the rest isn't scraped.
+    """
+    since = None if since is None else _to_utc(since)
+    until = None if until is None else _to_utc(until)
+    passed = 0
+    for tweet in items:
+        if since is not None and tweet.date < since:
+            passed += 1
+            if passed >= patience:
+                return
+            continue
+        passed = 0
+        if until is not None and tweet.date >= until:
+            continue
+        yield tweet
 
 
 def get_tweet(twitter_handle):
@@ -18,7 +213,7 @@ def get_tweet(twitter_handle):
         tweet (str) : List of all tweets. and the metadata surrounding them.
 
     """
-    scraper = sntwitter.TwitterUserScraper(twitter_handle).get_items()
+    scraper = _user_items(twitter_handle)
 
     for tweet in scraper:
         content = tweet.rawContent
@@ -37,7 +232,7 @@ def get_tweet_data(twitter_handle):
     Returns:
         tweet_data (list) : List of tweet data.
     """
-    scraper = sntwitter.TwitterUserScraper(twitter_handle).get_items()
+    scraper = _user_items(twitter_handle)
     tweet_data = []
 
     for tweet in scraper:
@@ -66,7 +261,7 @@ def get_tweet_date(twitter_handle):
         date (datetime object) : The date and time of the most recent tweet.
     """
     # stores all items of tweet
-    scraper = sntwitter.TwitterUserScraper(twitter_handle).get_items()
+    scraper = _user_items(twitter_handle)
 
     # collect the date from the most recent tweet.
     for tweet in scraper:
@@ -90,36 +285,36 @@ def get_thou_tweets(twitter_handle):
     The dates and times are converted to strings for easier comparison.
     """
 
-    tweets_list = []
+    path = f"raw-data/{twitter_handle}-1000.csv"
 
     # scrape a specific user
-    scraper = sntwitter.TwitterUserScraper(twitter_handle).get_items()
-
-    # loop through items in completed scrape
-    for i, tweet in enumerate(scraper):
-        if i > 1000:
-            break
-        # splits the date object into date and time elements
-        dates = tweet.date
-        # data being pulled
-        data = [dates, tweet.rawContent, tweet.viewCount]
-        # append data from each tweet.
-        tweets_list.append(data)
-    # turn data into dataframe (pandas)
-    tweets_df = pd.DataFrame(
-        tweets_list, columns=["date and time", "content", "view count"]
-    )
-    # add dataframe to csv
-    tweets_df.to_csv(f"raw-data/{twitter_handle}-1000.csv", index=False)
-    return tweets_df
-
-
-def get_tweets_in_month(twitter_handle, targ_month):
+    scraper = _user_items(twitter_handle)
+    # write the tweets to csv in batches as they are scraped
+    with TweetWriter(
+        path, ["date and time", "content", "view count"]
+    ) as writer:
+        # loop through items in completed scrape
+        for i, tweet in enumerate(scraper):
+            if i > 1000:
+                break
+            # splits the date object into date and time elements
+            dates = tweet.date
+            # data being pulled
+            data = [dates, tweet.rawContent, tweet.viewCount]
+            # append data from each tweet.
+            writer.write(data)
+    return _read_tweets(path)
+
+
+def get_tweets_in_month(twitter_handle, targ_month, since=None, until=None):
     """
     Scrapes through all tweets and returns tweets in specified month.
     Args:
         twitter_handle (str) : Handle of the account to grab tweets from.
         month (str) : First three characters of intended month.
+        since (str or datetime) : earliest time to search, yyyy-mm-dd. The
+        scrape stops once the timeline passes it.
+        until (str or datetime) : time to search before, yyyy-mm-dd.
 
     Returns:
         tweets_df (pd.dataframe) : Pandas dataframe containing data about tweets
@@ -129,40 +324,36 @@ def get_tweets_in_month(twitter_handle, targ_month):
     Month input is assumed to be in format "Jan", "Feb", "Mar", etc.
     """
 
-    tweets_list = []
+    path = f"raw-data/{twitter_handle}-in-{targ_month}.csv"
 
     # scrape specified user
-    scraper = sntwitter.TwitterUserScraper(twitter_handle).get_items()
-    # loop through items in completed scrape
-    for i, tweet in enumerate(scraper):
-        # splits the date object into date and time elements
-        date = tweet.date.strftime("%b-%d-%Y")
-        month = date[0:3]
-        # get total number of tweets
-        user_attributes = tweet.user
-        total_tweets = user_attributes.statusesCount
-        # break out of loops if loop index passes users total tweet count
-        if i > total_tweets:
-            break
-        # skip to next index if month doesnt match user input
-        if month not in targ_month:
-            continue
-        # data being stored
-        data = [tweet.date, tweet.rawContent, tweet.viewCount]
-        # append data from each tweet if in specified month
-        tweets_list.append(data)
-    # turn list into pandas dataframe
-    tweets_df = pd.DataFrame(
-        tweets_list, columns=["date and time", "content", "view count"]
-    )
-    # add dataframe to csv
-    tweets_df.to_csv(
-        f"raw-data/{twitter_handle}-in-{targ_month}.csv", index=False
-    )
-    return tweets_df
-
-
-def get_tweets_before(twitter_handle, before_hour):
+    scraper = _between(_user_items(twitter_handle), since, until)
+    # write the tweets to csv in batches as they are scraped
+    with TweetWriter(
+        path, ["date and time", "content", "view count"]
+    ) as writer:
+        # loop through items in completed scrape
+        for i, tweet in enumerate(scraper):
+            # splits the date object into date and time elements
+            date = tweet.date.strftime("%b-%d-%Y")
+            month = date[0:3]
+            # get total number of tweets
+            user_attributes = tweet.user
+            total_tweets = user_attributes.statusesCount
+            # break out of loops if loop index passes users total tweet count
+            if i > total_tweets:
+                break
+            # skip to next index if month doesnt match user input
+            if month not in targ_month:
+                continue
+            # data being stored
+            data = [tweet.date, tweet.rawContent, tweet.viewCount]
+            # append data from each tweet if in specified month
+            writer.write(data)
+    return _read_tweets(path)
+
+
+def get_tweets_before(twitter_handle, before_hour, since=None, until=None):
     """
     Scrapes through tweets and returns tweets tweeted before a specific time.
 
@@ -170,6 +361,9 @@ def get_tweets_before(twitter_handle, before_hour):
         twitter_handle (str) : Handle of the account to grab tweets from.
         before_hour (int) : specified hour to truncate tweets after
         (24hr format).
+        since (str or datetime) : earliest time to search, yyyy-mm-dd. The
+        scrape stops once the timeline passes it.
+        until (str or datetime) : time to search before, yyyy-mm-dd.
 
     Returns:
         tweets_df (pd.dataframe) : Pandas dataframe containing data about tweets
@@ -179,35 +373,32 @@ def get_tweets_before(twitter_handle, before_hour):
     be necersary to convert them back to datetime objects for plotting.
     """
 
-    tweets_list = []
+    path = f"raw-data/{twitter_handle}.csv"
 
     # scrape specified user
-    scraper = sntwitter.TwitterUserScraper(twitter_handle).get_items()
-    # loop through items in completed scrape
-    for i, tweet in enumerate(scraper):
-        # splits the date object into date and time elements
-        time = tweet.date.strftime("%H:%m")
-        hour = time[0:2]
-        # get total number of tweets
-        user_attributes = tweet.user
-        total_tweets = user_attributes.statusesCount
-        # break out of loops if loop index passes users total tweet count
-        if i > total_tweets:
-            break
-        # skip to next index if hour is after cutoff hour
-        if hour > before_hour:
-            continue
-        # data being stored
-        data = [tweet.date, tweet.rawContent, tweet.viewCount]
-        # append data from each tweet if in specified month
-        tweets_list.append(data)
-    # turn list into pandas dataframe
-    tweets_df = pd.DataFrame(
-        tweets_list, columns=["date and time", "content", "view count"]
-    )
-    # add dataframe to csv
-    tweets_df.to_csv(f"raw-data/{twitter_handle}.csv", index=False)
-    return tweets_df
+    scraper = _between(_user_items(twitter_handle), since, until)
+    # write the tweets to csv in batches as they are scraped
+    with TweetWriter(
+        path, ["date and time", "content", "view count"]
+    ) as writer:
+        # loop through items in completed scrape
+        for i, tweet in enumerate(scraper):
+            # gets the hour of the tweet
+            hour = tweet.date.hour
+            # get total number of tweets
+            user_attributes = tweet.user
+            total_tweets = user_attributes.statusesCount
+            # break out of loops if loop index passes users total tweet count
+            if i > total_tweets:
+                break
+            # skip to next index if hour is after cutoff hour
+            if hour > int(before_hour):
+                continue
+            # data being stored
+            data = [tweet.date, tweet.rawContent, tweet.viewCount]
+            # append data from each tweet if in specified month
+            writer.write(data)
+    return _read_tweets(path)
 
 
 def get_all_tweets(twitter_handle):
@@ -222,37 +413,35 @@ def get_all_tweets(twitter_handle):
         specified user.
     """
 
-    tweets_list = []
+    path = f"raw-data/{twitter_handle}-all-tweets.csv"
+    # the existing csv is only replaced once the whole timeline is scraped,
+    # and an interrupted scrape is left for update_all_tweets to resume
+    partial_path = f"raw-data/{twitter_handle}-all-tweets.partial.csv"
 
     # scrape specified user
-    scraper = sntwitter.TwitterUserScraper(twitter_handle).get_items()
-    # loop through items in completed scrape
-    for i, tweet in enumerate(scraper):
-        # get total number of tweets
-        user_attributes = tweet.user
-        total_tweets = user_attributes.statusesCount
-        # break out of loops if loop index passes users total tweet count
-        if i > total_tweets:
-            break
-        # skip to next index if hour is after cutoff hour
-        # data being stored
-        data = [
-            tweet.date,
-            tweet.rawContent,
-            tweet.likeCount,
-            tweet.retweetCount,
-        ]
-        # append data from each tweet if in specified month
-        tweets_list.append(data)
-    # turn list into pandas dataframe
-    tweets_df = pd.DataFrame(
-        tweets_list,
-        columns=["date and time", "content", "like count", "retweet count"],
-    )
-    # add dataframe to csv
-    tweets_df.to_csv(f"raw-data/{twitter_handle}-all-tweets.csv", index=False)
-
-    return tweets_df
+    scraper = _user_items(twitter_handle)
+    # write the tweets to csv in batches as they are scraped
+    with TweetWriter(partial_path, ALL_TWEETS_COLUMNS) as writer:
+        # loop through items in completed scrape
+        for i, tweet in enumerate(scraper):
+            # get total number of tweets
+            user_attributes = tweet.user
+            total_tweets = user_attributes.statusesCount
+            # break out of loops if loop index passes users total tweet count
+            if i > total_tweets:
+                break
+            # skip to next index if hour is after cutoff hour
+            # data being stored
+            data = [
+                tweet.date,
+                tweet.rawContent,
+                tweet.likeCount,
+                tweet.retweetCount,
+            ]
+            # append data from each tweet if in specified month
+            writer.write(data)
+    os.replace(partial_path, path)
+    return _read_tweets(path)
 
 
 def get_tweets_after(twitter_handle, year):
@@ -266,31 +455,28 @@ def get_tweets_after(twitter_handle, year):
     Returns:
         tweets_df (pd.dataframe) : Pandas dataframe containing data about tweets
         tweeted after the given year.
-    """
 
-    tweets_list = []
+    Note:
+    The timeline is newest first, so the scrape stops once it reaches the
+    given year.
+    """
 
-    # scrape specified user
-    scraper = sntwitter.TwitterUserScraper(twitter_handle).get_items()
-    # loop through items in completed scrape
-    for tweet in scraper:
-        # get current year
-        current_year = tweet.date.strftime("%Y")
-        # break out of loop when target year is reached
-        if current_year == year:
-            break
-        # data being stored
-        data = [tweet.date, tweet.rawContent, tweet.viewCount]
-        # append data from each tweet if in specified month
-        tweets_list.append(data)
-    # turn list into pandas dataframe
-    tweets_df = pd.DataFrame(
-        tweets_list, columns=["date and time", "content", "view count"]
-    )
-    # add dataframe to csv
-    tweets_df.to_csv(f"raw-data/{twitter_handle}-after-{year}.csv", index=False)
+    path = f"raw-data/{twitter_handle}-after-{year}.csv"
+    start = datetime(int(year) + 1, 1, 1, tzinfo=timezone.utc)
 
-    return tweets_df
+    # scrape specified user, only reading back to the end of the year
+    scraper = _between(_user_items(twitter_handle), start)
+    # write the tweets to csv in batches as they are scraped
+    with TweetWriter(
+        path, ["date and time", "content", "view count"]
+    ) as writer:
+        # loop through items in completed scrape
+        for tweet in scraper:
+            # data being stored
+            data = [tweet.date, tweet.rawContent, tweet.viewCount]
+            # append data from each tweet if in specified month
+            writer.write(data)
+    return _read_tweets(path)
 
 
 def get_tweets_on_year(twitter_handle, year):
@@ -304,27 +490,416 @@ def get_tweets_on_year(twitter_handle, year):
     Returns:
         tweets_df (pd.dataframe) : Pandas dataframe containing data about tweets
         tweeted in the given year
+
+    Note:
+    The timeline is newest first, so the scrape stops once it passes the
+    start of the year.
     """
 
-    tweets_list = []
+    path = f"raw-data/{twitter_handle}-in-{year}.csv"
+    start = datetime(int(year), 1, 1, tzinfo=timezone.utc)
+    end = datetime(int(year) + 1, 1, 1, tzinfo=timezone.utc)
+
+    # scrape specified user, only reading back to the start of the year
+    scraper = _between(_user_items(twitter_handle), start, end)
+    # write the tweets to csv in batches as they are scraped
+    with TweetWriter(
+        path, ["date and time", "content", "like count"]
+    ) as writer:
+        # loop through items in completed scrape
+        for tweet in scraper:
+            # data being stored
+            data = [tweet.date, tweet.rawContent, tweet.likeCount]
+            # append data from each tweet if in specified month
+            writer.write(data)
+    return _read_tweets(path)
+
+
+def _all_tweets_row(tweet):
+    """
+    Gets the row of the all-tweets csv for a tweet.
 
-    # scrape specified user
-    scraper = sntwitter.TwitterUserScraper(twitter_handle).get_items()
-    # loop through items in completed scrape
-    for tweet in scraper:
-        # get current year
-        current_year = tweet.date.strftime("%Y")
-        # break out of loop when target year is reached
-        if current_year != year:
-            continue
-        # data being stored
-        data = [tweet.date, tweet.rawContent, tweet.likeCount]
-        # append data from each tweet if in specified month
-        tweets_list.append(data)
-    # turn list into pandas dataframe
-    tweets_df = pd.DataFrame(
-        tweets_list, columns=["date and time", "content", "like count"]
-    )
-    # add dataframe to csv
-    tweets_df.to_csv(f"raw-data/{twitter_handle}-in-{year}.csv", index=False)
+    Args:
+        tweet (snscrape tweet) : tweet to store.
+
+    Returns:
+        row (list) : date, content, like count and retweet count of the tweet,
+        formatted as pandas writes them.
+    """
+    return [
+        str(tweet.date),
+        tweet.rawContent,
+        tweet.likeCount,
+        tweet.retweetCount,
+    ]
+
+
+def _read_newest(path, patience=2):
+    """
+    Reads the newest tweets stored in an all-tweets csv.
+
+    Args:
+        path (str) : path of the csv, sorted newest first.
+        patience (int) : number of rows in a row older than the newest one to
+        read before stopping, so that a pinned tweet at the top of the csv
+        isn't taken as the newest.
+
+    Returns:
+        newest (datetime) : time of the newest stored tweet, or None if the
+        csv is empty.
+        known (set) : (date, content) keys of the rows read, used to skip
+        tweets that are already stored.
+    """
+    newest, known = None, set()
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        passed = 0
+        for row in reader:
+            date = datetime.fromisoformat(row[0])
+            known.add((row[0], row[1]))
+            if newest is not None and date < newest:
+                passed += 1
+                if passed >= patience:
+                    break
+                continue
+            newest, passed = date, 0
+    return newest, known
+
+
+def _read_oldest(path):
+    """
+    Reads where an interrupted crawl stopped from its partial csv.
+
+    The crawl writes tweets in timeline order, so the last row is the last
+    tweet it read. The top row is not used on its own, because it may be a
+    pinned tweet older than the rest of the timeline.
+
+    Args:
+        path (str) : path of the partial csv, sorted newest first apart from
+        a pinned tweet at the top.
+
+    Returns:
+        oldest (datetime) : time of the last tweet written, or None if the
+        crawl has to start again from the top of the timeline.
+        known (set) : (date, content) keys of the top row and of the last
+        tweets written, which the resumed crawl can read again.
+    """
+    oldest, known, top, rows = None, set(), None, 0
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        for row in reader:
+            date = datetime.fromisoformat(row[0])
+            rows += 1
+            if top is None:
+                top = (row[0], row[1])
+            if date != oldest:
+                oldest, known = date, set()
+            known.add((row[0], row[1]))
+    if top is not None:
+        known.add(top)
+    if rows < 2:
+        oldest = None
+    return oldest, known
+
+
+def _crawl_to_csv(items, path, stop_before=None, known=(), patience=2):
+    """
+    Appends tweets from a timeline to a csv, flushing it in batches.
+
+    Args:
+        items (iterator) : snscrape tweets, newest first.
+        path (str) : path of the csv to append to. Its header is written if it
+        doesn't exist yet.
+        stop_before (datetime) : stop once tweets are older than this, or None
+        to crawl the whole timeline.
+        known (set) : (date, content) keys of tweets to skip as already stored.
+        patience (int) : number of tweets in a row older than stop_before to
+        read before stopping, so that a pinned tweet doesn't stop the crawl.
+
+    Returns:
+        count (int) : number of tweets appended.
+    """
+    with instrument.span("twitscrape.crawl", path=path), TweetWriter(
+        path, ALL_TWEETS_COLUMNS, append=True
+    ) as writer:
+        passed = 0
+        for tweet in items:
+            row = _all_tweets_row(tweet)
+            if stop_before is not None and tweet.date < stop_before:
+                passed += 1
+                if passed >= patience:
+                    break
+                continue
+            passed = 0
+            if (row[0], row[1]) in known:
+                continue
+            # the partial csv is flushed in batches, so it is a checkpoint
+            writer.write(row)
+            instrument.count("tweets_scraped")
+    return writer.get_count()
+
+
+def _watch(items, on_tweet):
+    """
+    Calls a function with each tweet as it is read from an iterator.
+
+    Args:
+        items (iterator) : snscrape tweets.
+        on_tweet (function) : called with each tweet.
+
+    Yields:
+        tweet (snscrape tweet) : each tweet from items.
+    """
+    for tweet in items:
+        on_tweet(tweet)
+        yield tweet
+
+
+def _paced(items, bucket, page_size):
+    """
+    Takes a token from a rate limit before each page of tweets is requested.
+
+    The scraper requests the next page when the first tweet of it is read,
+    so a token is taken before reading every page_size-th tweet. The
+    scraper only finds the timeline has ended by requesting one more page,
+    so the token of a page with no tweets is given back.
+
+    Args:
+        items (iterator) : snscrape tweets.
+        bucket (TokenBucket) : the rate limit, with acquire and release
+        methods taking and giving back a token.
+        page_size (int) : number of tweets the scraper gets per request.
+
+    Yields:
+        tweet (snscrape tweet) : each tweet from items.
+    """
+    items = iter(items)
+    read = 0
+    while True:
+        if read % page_size == 0:
+            bucket.acquire()
+        try:
+            tweet = next(items)
+        except StopIteration:
+            if read % page_size == 0:
+                bucket.release()
+            return
+        read += 1
+        yield tweet
+
+
+def _prepend_csv(new_path, path):
+    """
+    Puts the rows of one csv in front of the rows of another.
+
+    Args:
+        new_path (str) : csv with the rows to put first. It is removed.
+        path (str) : csv to add the rows to. Both must have the same header.
+    """
+    merged_path = f"{path}.merged"
+    with open(merged_path, "w", encoding="utf-8", newline="") as merged:
+        for source, skip_header in ((new_path, False), (path, True)):
+            with open(source, "r", encoding="utf-8", newline="") as file:
+                if skip_header:
+                    next(file, None)
+                for line in file:
+                    merged.write(line)
+    os.replace(merged_path, path)
+    os.remove(new_path)
+
+
+def update_all_tweets(
+    twitter_handle,
+    patience=2,
+    on_tweet=None,
+    bucket=None,
+    page_size=PAGE_SIZE,
+):
+    """
+    Adds the tweets newer than the ones in a user's all-tweets csv.
+
+    Only the timeline up to the newest stored tweet is scraped. If there is no
+    csv yet, the whole timeline is scraped. A crawl that is interrupted leaves
+    a partial csv behind, and the next call resumes from its oldest tweet
+    instead of starting again.
+
+    Args:
+        twitter_handle (str) : Handle of the account to grab tweets from.
+        patience (int) : number of tweets in a row older than the stored ones to
+        read before stopping, so that a pinned tweet doesn't stop the crawl.
+        on_tweet (function) : called with each tweet as it is read from the
+        scraper, for example to count them.
+        bucket (TokenBucket) : rate limit to take a token from before each
+        page of tweets is requested, or None.
+        page_size (int) : number of tweets the scraper gets per request.
+
+    Returns:
+        tweets_df (pd.dataframe) : Pandas dataframe containing the tweets that
+        were added.
+    """
+    path = f"raw-data/{twitter_handle}-all-tweets.csv"
+    partial_path = f"raw-data/{twitter_handle}-all-tweets.partial.csv"
+
+    newest, known = None, set()
+    if os.path.exists(path):
+        newest, known = _read_newest(path)
+
+    if os.path.exists(partial_path):
+        # resume an interrupted crawl from the last tweet it wrote
+        oldest, oldest_known = _read_oldest(partial_path)
+        known = known | oldest_known
+        if oldest is None:
+            items = _user_items(twitter_handle)
+        else:
+            until = (oldest + timedelta(days=1)).strftime("%Y-%m-%d")
+            items = (
+                tweet
+                for tweet in _search_items(
+                    f"from:{twitter_handle} until:{until}"
+                )
+                if tweet.date <= oldest
+            )
+    else:
+        items = _user_items(twitter_handle)
+
+    if bucket is not None:
+        items = _paced(items, bucket, page_size)
+    if on_tweet is not None:
+        items = _watch(items, on_tweet)
+    _crawl_to_csv(items, partial_path, newest, known, patience)
+
+    tweets_df = _read_tweets(partial_path)
+    if newest is None:
+        os.replace(partial_path, path)
+    else:
+        _prepend_csv(partial_path, path)
     return tweets_df
+
+
+def in_month(targ_month):
+    """
+    Makes a filter for tweets tweeted in a month.
+
+    Args:
+        targ_month (str) : First three characters of intended month, such as
+        "Jan", "Feb", "Mar".
+
+    Returns:
+        predicate (function) : filter taking a tweet's date and content.
+    """
+    return lambda date, content: date.strftime("%b") in targ_month
+
+
+def hour_at_most(hour):
+    """
+    Makes a filter for tweets tweeted at or before an hour of the day.
+
+    Args:
+        hour (int) : specified hour to truncate tweets after (24hr format).
+
+    Returns:
+        predicate (function) : filter taking a tweet's date and content.
+    """
+    return lambda date, content: date.hour <= int(hour)
+
+
+def on_year(year):
+    """
+    Makes a filter for tweets tweeted in a year.
+
+    Args:
+        year (int) : Year of the tweets to keep.
+
+    Returns:
+        predicate (function) : filter taking a tweet's date and content.
+    """
+    return lambda date, content: date.year == int(year)
+
+
+def after_year(year):
+    """
+    Makes a filter for tweets tweeted after a year.
+
+    Args:
+        year (int) : Year of which to keep all tweets after.
+
+    Returns:
+        predicate (function) : filter taking a tweet's date and content.
+    """
+    return lambda date, content: date.year > int(year)
+
+
+def _write_filtered(records, twitter_handle, filters):
+    """
+    Sends every tweet through a set of filters, writing each filter's csv.
+
+    Args:
+        records (iterator) : (date, row) pairs of each tweet's datetime and
+        all-tweets csv row.
+        twitter_handle (str) : Handle of the account the tweets are from.
+        filters (dict) : filters keyed by the name of their output. Each takes
+        a tweet's date and content and returns True to keep the tweet.
+
+    Returns:
+        tweets_dfs (dict) : Pandas dataframe of the tweets kept by each filter,
+        keyed by filter name. They are saved to raw-data/{handle}-{name}.csv.
+    """
+    if "all-tweets" in filters:
+        raise ValueError("a filter can't overwrite the all-tweets csv")
+    paths = {name: f"raw-data/{twitter_handle}-{name}.csv" for name in filters}
+    with ExitStack() as stack:
+        writers = {
+            name: stack.enter_context(TweetWriter(path, ALL_TWEETS_COLUMNS))
+            for name, path in paths.items()
+        }
+        for date, row in records:
+            for name, predicate in filters.items():
+                if predicate(date, row[1]):
+                    writers[name].write(row)
+    return {name: _read_tweets(path) for name, path in paths.items()}
+
+
+def scrape_filtered(twitter_handle, filters, since=None, until=None):
+    """
+    Crawls a user's timeline once, writing the tweets kept by each filter.
+
+    Args:
+        twitter_handle (str) : Handle of the account to grab tweets from.
+        filters (dict) : filters keyed by the name of their output, such as
+        {"in-Feb": in_month("Feb"), "in-2014": on_year(2014)}.
+        since (str or datetime) : earliest time to scrape, yyyy-mm-dd. The
+        crawl stops once the timeline passes it.
+        until (str or datetime) : time to scrape before, yyyy-mm-dd.
+
+    Returns:
+        tweets_dfs (dict) : Pandas dataframe of the tweets kept by each filter,
+        keyed by filter name. They are saved to raw-data/{handle}-{name}.csv.
+    """
+    records = (
+        (tweet.date, _all_tweets_row(tweet))
+        for tweet in _between(_user_items(twitter_handle), since, until)
+    )
+    return _write_filtered(records, twitter_handle, filters)
+
+
+def filter_archive(twitter_handle, filters):
+    """
+    Runs filters over a user's all-tweets csv instead of scraping again.
+
+    Args:
+        twitter_handle (str) : Handle of the account whose archive to filter.
+        filters (dict) : filters keyed by the name of their output, such as
+        {"in-Feb": in_month("Feb"), "in-2014": on_year(2014)}.
+
+    Returns:
+        tweets_dfs (dict) : Pandas dataframe of the tweets kept by each filter,
+        keyed by filter name. They are saved to raw-data/{handle}-{name}.csv.
+    """
+    path = f"raw-data/{twitter_handle}-all-tweets.csv"
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        records = ((datetime.fromisoformat(row[0]), row) for row in reader)
+        return _write_filtered(records, twitter_handle, filters)